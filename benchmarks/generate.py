@@ -0,0 +1,120 @@
+import argparse
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import insert, delete
+from database.connection import engine
+from database.models import Base, User, ServerData, ServerMembership, WordleData, WordleServerMembership, UserStats, FAILED_SCORE
+from util.util import SCORE_COLUMNS, streaks_from_numbers
+
+# Wordle 0 was played on this date, so a day's Wordle number is its distance from it
+FIRST_WORDLE_DATE = date(2021, 6, 19)
+# Roughly the share of players finishing in 1-6 guesses or failing, as published in Wordle's own stats
+SCORE_WEIGHTS = {1: 0.5, 2: 6, 3: 23, 4: 33, 5: 24, 6: 11, FAILED_SCORE: 2.5}
+INSERT_CHUNK_SIZE = 10000
+
+def score_weights(skill: float) -> list[float]:
+    # skill > 0 shifts weight toward low scores, skill < 0 toward high ones
+    return [weight * math.exp(skill * (4 - min(score, 7))) for score, weight in SCORE_WEIGHTS.items()]
+
+def wordle_grid(rng: random.Random, score: int) -> str:
+    # A grid verify_wordle_info accepts: one row per guess, solved rows only at the end of a win
+    rows = 6 if score == FAILED_SCORE else score
+    lines = []
+    for _ in range(rows - (0 if score == FAILED_SCORE else 1)):
+        line = 'GGGGG'
+        while line == 'GGGGG':
+            line = ''.join(rng.choices('WBYG', weights = (5, 0, 2, 2), k = 5))
+        lines.append(line)
+    if score != FAILED_SCORE:
+        lines.append('GGGGG')
+    return '\n'.join(lines)
+
+def insert_chunked(connection, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        connection.execute(insert(model), rows[start:start + INSERT_CHUNK_SIZE])
+
+def generate(users: int, servers: int, days: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    end_date = datetime.now(ZoneInfo('America/Los_Angeles')).date()
+    start_date = end_date - timedelta(days = days - 1)
+
+    server_ids = [10 ** 17 + i for i in range(servers)]
+    # Pareto weights give a few very large servers and a long tail of small ones, like real Discord guilds
+    server_sizes = [rng.paretovariate(1.2) for _ in server_ids]
+
+    user_rows, membership_rows, players = [], [], []
+    for i in range(users):
+        user_id = 2 * 10 ** 17 + i
+        user_rows.append({'user_id': user_id, 'user_name': f'user{i}', 'avatar': f'https://cdn.discordapp.com/embed/avatars/{i % 6}.png'})
+        user_servers = list(dict.fromkeys(rng.choices(server_ids, weights = server_sizes, k = rng.randint(1, 3))))
+        for server_id in user_servers:
+            membership_rows.append({'user_id': user_id, 'server_id': server_id, 'display_name': f'Player {i}'})
+        # (user_id, home server, score weights, daily play rate, first day played)
+        players.append((user_id, user_servers[0], score_weights(rng.gauss(0, 0.3)), rng.betavariate(2, 1.5), rng.randint(0, days - 1)))
+
+    Base.metadata.create_all(engine)
+    wordle_count = 0
+    with engine.begin() as connection:
+        for model in (UserStats, WordleServerMembership, WordleData, ServerMembership, ServerData, User):
+            connection.execute(delete(model))
+        insert_chunked(connection, User, user_rows)
+        insert_chunked(connection, ServerData, [{'server_id': server_id, 'prefix': '!'} for server_id in server_ids])
+        insert_chunked(connection, ServerMembership, membership_rows)
+
+        # Wordles are generated and flushed a chunk at a time so memory stays flat however many rows are asked for
+        wordle_rows, server_wordle_rows, stats_rows = [], [], []
+        for user_id, home_server_id, weights, play_rate, joined in players:
+            numbers, counts = [], dict.fromkeys(SCORE_COLUMNS, 0)
+            for day in range(joined, days):
+                if rng.random() > play_rate:
+                    continue
+                wordle_date = start_date + timedelta(days = day)
+                wordle_id = (wordle_date - FIRST_WORDLE_DATE).days
+                score = rng.choices(list(SCORE_WEIGHTS), weights = weights)[0]
+                wordle_rows.append({'user_id': user_id, 'wordle_id': wordle_id, 'wordle_score': score, 'wordle_grid': wordle_grid(rng, score), 'wordle_date': wordle_date})
+                server_wordle_rows.append({'user_id': user_id, 'server_id': home_server_id, 'wordle_id': wordle_id})
+                numbers.append(wordle_id)
+                counts[score] += 1
+
+            stats_row = {column: counts[score] for score, column in SCORE_COLUMNS.items()}
+            stats_row.update(user_id = user_id, total_games = len(numbers), score_sum = sum(score * count for score, count in counts.items()))
+            current_streak, longest_streak, last_wordle_number = streaks_from_numbers(numbers) if numbers else (0, 0, None)
+            stats_row.update(current_streak = current_streak, longest_streak = longest_streak, last_wordle_number = last_wordle_number)
+            stats_rows.append(stats_row)
+
+            if len(wordle_rows) >= INSERT_CHUNK_SIZE:
+                connection.execute(insert(WordleData), wordle_rows)
+                connection.execute(insert(WordleServerMembership), server_wordle_rows)
+                wordle_count += len(wordle_rows)
+                wordle_rows, server_wordle_rows = [], []
+        if wordle_rows:
+            connection.execute(insert(WordleData), wordle_rows)
+            connection.execute(insert(WordleServerMembership), server_wordle_rows)
+            wordle_count += len(wordle_rows)
+        insert_chunked(connection, UserStats, stats_rows)
+
+    return {
+        'users': len(user_rows),
+        'servers': len(server_ids),
+        'memberships': len(membership_rows),
+        'wordles': wordle_count,
+        'seed': seed
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Fill the configured database (DATABASE_URL) with synthetic Wordle data. Existing rows are deleted.')
+    parser.add_argument('--users', type = int, default = 5000)
+    parser.add_argument('--servers', type = int, default = 500)
+    parser.add_argument('--days', type = int, default = 730, help = 'days of history ending today')
+    parser.add_argument('--seed', type = int, default = 1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.users, args.servers, args.days, args.seed)
+    print(f'GENERATED {counts} IN {time.perf_counter() - start:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable
+from PIL import Image
+from sqlalchemy import func
+import config
+from database.connection import engine, get_session
+from database.models import User, ServerMembership, WordleData
+from cogs.leaderboard import Leaderboard, PAGE_SIZE
+from cogs.stats import Stats
+from cogs.store_wordle import StoreWordle
+from util import render
+from util.assets import assets, AVATAR_SIZE
+from util.score_engine import score_engine
+from util.util import score_label
+from benchmarks.generate import wordle_grid, SCORE_WEIGHTS
+
+PERIODS = ('daily', 'weekly', 'monthly', 'yearly', 'all time')
+SAMPLE_USERS = 20
+PARSE_MESSAGES = 1000
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1, returns_value: bool = True) -> dict:
+    # The queries return None when they hit a database error, which would otherwise be timed as a fast success
+    def call():
+        if func() is None and returns_value:
+            raise RuntimeError('benchmarked call returned None; check the database errors above')
+    for _ in range(warmup):
+        call()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'max': max(timings)
+    }
+
+def dataset_summary() -> dict:
+    session = get_session()
+    try:
+        return {
+            'users': session.query(func.count(User.user_id)).scalar(),
+            'memberships': session.query(func.count()).select_from(ServerMembership).scalar(),
+            'wordles': session.query(func.count()).select_from(WordleData).scalar()
+        }
+    finally:
+        session.close()
+
+def sample_ids(rng: random.Random) -> tuple[list[int], int]:
+    # Users who have played, and the server with the most members so server boards are the worst case
+    session = get_session()
+    try:
+        user_ids = [user_id for user_id, in session.query(WordleData.user_id).distinct().all()]
+        server_id = session.query(ServerMembership.server_id).group_by(ServerMembership.server_id).order_by(func.count().desc()).limit(1).scalar()
+    finally:
+        session.close()
+    return rng.sample(user_ids, min(SAMPLE_USERS, len(user_ids))), server_id
+
+def cycle(values: list) -> Callable[[], Any]:
+    # Each timed call takes the next sample, so repeats don't just hit the same cached rows
+    state = {'i': 0}
+    def next_value():
+        value = values[state['i'] % len(values)]
+        state['i'] += 1
+        return value
+    return next_value
+
+def wordle_messages(rng: random.Random) -> list[str]:
+    # Mostly chatter, as in a real Wordle channel, with every tenth message a Wordle share
+    messages = []
+    for i in range(PARSE_MESSAGES):
+        if i % 10:
+            messages.append(rng.choice(['gm', 'that one was hard', 'Wordle is down?', 'lol', 'how did you get it in 2']))
+            continue
+        score = rng.choices(list(SCORE_WEIGHTS), weights = list(SCORE_WEIGHTS.values()))[0]
+        grid = wordle_grid(rng, score).translate(str.maketrans({'W': '⬜', 'B': '⬛', 'Y': '🟨', 'G': '🟩'}))
+        messages.append(f'Wordle {rng.randint(200, 1600):,} {score_label(score)}/6\n\n{grid}')
+    return messages
+
+def share_messages(rng: random.Random, user_ids: list[int], server_id: int) -> list[SimpleNamespace]:
+    # Stand-ins for discord.Message carrying only what StoreWordle.submission reads
+    avatar = SimpleNamespace(replace = lambda **kwargs: SimpleNamespace(url = 'https://cdn.discordapp.com/embed/avatars/0.png'))
+    messages = []
+    for content in wordle_messages(rng):
+        if StoreWordle.extract_wordle_info(content) is None:
+            continue
+        user_id = rng.choice(user_ids)
+        author = SimpleNamespace(id = user_id, name = f'user{user_id}', display_name = f'Player {user_id}', display_avatar = avatar)
+        messages.append(SimpleNamespace(content = content, author = author, guild = SimpleNamespace(id = server_id), created_at = datetime.now(timezone.utc)))
+    return messages
+
+def run(repeat: int, engines: list[str], seed: int) -> dict:
+    rng = random.Random(seed)
+    user_ids, server_id = sample_ids(rng)
+    next_user = cycle(user_ids)
+    results = {}
+
+    original_engine = config.LEADERBOARD_ENGINE
+    for leaderboard_engine in engines:
+        if leaderboard_engine == 'numpy' and not score_engine.load():
+            continue
+        config.LEADERBOARD_ENGINE = leaderboard_engine
+        for period in PERIODS:
+            results[f'leaderboard.global.{leaderboard_engine}.{period}'] = measure(
+                lambda: Leaderboard.get_leaderboard(period, None, server_id, limit = PAGE_SIZE + 1, user_id = next_user()), repeat
+            )
+    config.LEADERBOARD_ENGINE = original_engine
+
+    if score_engine.loaded:
+        # The rows the live path hands the engine, so a shape mismatch fails here instead of in the submission worker
+        submissions = [StoreWordle.submission(message, StoreWordle.extract_wordle_info(message.content)) for message in share_messages(rng, user_ids, server_id)]
+        size = score_engine.size
+        results['engine.append'] = measure(lambda: score_engine.append(submissions), repeat, returns_value = False)
+        if score_engine.size != size + len(submissions) * (repeat + 1):
+            raise RuntimeError('ScoreEngine.append did not store the rows StoreWordle.submission builds')
+
+    for period in PERIODS:
+        results[f'leaderboard.server.{period}'] = measure(
+            lambda: Leaderboard.get_leaderboard(period, server_id, server_id, limit = PAGE_SIZE + 1, user_id = next_user()), repeat
+        )
+        # The caller's rank alone, which is what a cached board still has to query for each new user
+        results[f'leaderboard.user_rank.{period}'] = measure(
+            lambda: Leaderboard.get_leaderboard(period, None, server_id, limit = 0, user_id = next_user()), repeat
+        )
+
+    results['stats.calculate_stats'] = measure(lambda: Stats.calculate_stats(next_user()), repeat)
+
+    # Rendered in-process with every avatar stubbed as the default one; cold clears the per-worker tile caches first
+    assets.load()
+    page_entries, _, _ = Leaderboard.get_leaderboard('all time', None, server_id, limit = PAGE_SIZE)
+    avatar = Image.new('RGBA', (AVATAR_SIZE, AVATAR_SIZE), (128, 128, 128, 255)).tobytes()
+    avatars = [avatar] * len(page_entries)
+    def render_cold():
+        render._header_layers.clear()
+        render._row_tiles.clear()
+        return render.render_leaderboard(page_entries, avatars, False, user_ids[0])
+    results['render.leaderboard.cold'] = measure(render_cold, repeat)
+    results['render.leaderboard.warm'] = measure(lambda: render.render_leaderboard(page_entries, avatars, False, user_ids[0]), repeat)
+    stats_data = Stats.calculate_stats(user_ids[0])
+    if stats_data is not None:
+        total_games, win_percentage, average_score, score_counts, current_streak, longest_streak = stats_data
+        results['render.stats'] = measure(lambda: render.render_stats(total_games, Stats.format_decimals(win_percentage), average_score, current_streak, longest_streak, score_counts), repeat)
+
+    messages = wordle_messages(rng)
+    parsed = [info for info in map(StoreWordle.extract_wordle_info, messages) if info is not None]
+    results['parse.extract_wordle_info'] = measure(lambda: [StoreWordle.extract_wordle_info(message) for message in messages], repeat)
+    # What on_message does for every guild message before it looks up the Wordle channel
+    results['parse.on_message_filter'] = measure(lambda: [StoreWordle.extract_wordle_info(message) for message in messages if StoreWordle.looks_like_wordle(message)], repeat)
+    results['parse.verify_wordle_info'] = measure(lambda: [StoreWordle.verify_wordle_info(score, grid) for _, score, grid in parsed], repeat)
+
+    return results
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> list[str]:
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result['median'] > baseline[name]['median'] * (1 + tolerance):
+            regressions.append(f'{name}: {baseline[name]["median"] * 1000:.2f}ms -> {result["median"] * 1000:.2f}ms')
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Time WordleBot hot paths against the configured database (DATABASE_URL).')
+    parser.add_argument('--repeat', type = int, default = 10)
+    parser.add_argument('--engines', default = 'sql,numpy', help = 'comma separated leaderboard engines to time')
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--output', help = 'write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help = 'earlier JSON results to compare medians against')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'allowed median slowdown against the baseline before failing')
+    args = parser.parse_args()
+
+    report = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': engine.dialect.name,
+        'dataset': dataset_summary(),
+        'results': run(args.repeat, args.engines.split(','), args.seed)
+    }
+    output = json.dumps(report, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        regressions = compare(report['results'], args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file = sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,14 @@
 import asyncio
+import time
 import discord
 from discord.ext import commands
 from discord.ext.commands import Bot
 from discord import Message
 import config
-from database.connection import get_session
-from database.models import ServerData
+from database.connection import run_db
+from util.guild_config import guild_configs
+from util.render import render_pool
+from util.metrics import MetricsServer, COMMAND_LATENCY
 
 intents = discord.Intents.default()
 intents.message_content = True
@@ -13,12 +16,15 @@ intents.guilds = True
 intents.members = True
 
 async def get_prefix(bot: Bot, message: Message):
-    session = get_session()
-    server = session.query(ServerData).filter(ServerData.server_id == message.guild.id).first()
-    session.close()
-    return server.prefix if server else '!'
+    if message.guild is None:
+        return '!'
+    return await guild_configs.get_prefix(message.guild.id)
 
-bot = commands.Bot(command_prefix = get_prefix, intents = intents)
+def create_bot(shard_ids: list[int] | None = None, shard_count: int | None = None) -> Bot:
+    # A process given explicit shards (by launcher.py or SHARD_IDS) or AUTO_SHARD runs an AutoShardedBot
+    if shard_ids is not None or config.AUTO_SHARD:
+        return commands.AutoShardedBot(command_prefix = get_prefix, intents = intents, shard_ids = shard_ids, shard_count = shard_count)
+    return commands.Bot(command_prefix = get_prefix, intents = intents)
 
 initial_extensions = [
     'cogs.setup',
@@ -29,16 +35,37 @@ initial_extensions = [
     'cogs.misc'
 ]
 
-@bot.event
-async def on_ready() -> None:
-    print(f'LOGGED IN AS {bot.user} (ID: {bot.user.id})')
+async def main(shard_ids: list[int] | None = config.SHARD_IDS, shard_count: int | None = config.SHARD_COUNT) -> None:
+    bot = create_bot(shard_ids, shard_count)
+
+    @bot.event
+    async def on_ready() -> None:
+        shards = f' (SHARDS: {sorted(bot.shards)} OF {bot.shard_count})' if isinstance(bot, commands.AutoShardedBot) else ''
+        print(f'LOGGED IN AS {bot.user} (ID: {bot.user.id}){shards}')
+
+    @bot.before_invoke
+    async def start_command_timer(ctx: commands.Context) -> None:
+        ctx.command_started_at = time.perf_counter()
+
+    # discord.py calls after_invoke hooks whether or not the command raised
+    @bot.after_invoke
+    async def record_command_latency(ctx: commands.Context) -> None:
+        COMMAND_LATENCY.observe(time.perf_counter() - ctx.command_started_at, command = ctx.command.qualified_name)
 
-async def main() -> None:
     bot.remove_command('help')
-    async with bot:
-        for extension in initial_extensions:
-            await bot.load_extension(extension)
-        await bot.start(config.DISCORD_BOT_TOKEN)
+    await run_db(guild_configs.load, shard_ids, shard_count)
+    metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT + config.CLUSTER_ID) if config.METRICS_PORT else None
+    try:
+        if metrics_server is not None:
+            await metrics_server.start()
+        async with bot:
+            for extension in initial_extensions:
+                await bot.load_extension(extension)
+            await bot.start(config.DISCORD_BOT_TOKEN)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        render_pool.shutdown()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,187 +1,250 @@
 import discord
-from discord.ext import commands
-from datetime import datetime
+from discord.ext import commands, tasks
+from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from io import BytesIO
-import requests
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, case, cast, Integer
-from database.connection import get_session
-from database.models import User, WordleData, ServerMembership
+from sqlalchemy import func, tuple_, literal_column, cast, Integer
+from database.connection import get_session, run_db
+from database.models import User, WordleData, ServerMembership, LeaderboardSnapshot, LeaderboardSnapshotMeta
+from util.avatar_cache import AvatarCache
+from util.render import render_pool, render_leaderboard
+from util.render_cache import leaderboard_cache, GLOBAL_SCOPE
+from util.util import period_range
+from util.leaderboard_snapshot import refresh_snapshots, SNAPSHOT_PERIODS, GLOBAL_SCOPE_ID
+from util.score_engine import score_engine
+import config
+
+PAGE_SIZE = 10
 
 class Leaderboard(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.avatar_cache = AvatarCache(config.AVATAR_CACHE_SIZE, config.AVATAR_CACHE_DIR, config.AVATAR_FETCH_TIMEOUT, config.AVATAR_FETCH_CONCURRENCY, config.AVATAR_DISK_CACHE_SIZE)
+
+    async def cog_load(self) -> None:
+        await self.avatar_cache.start()
+        if config.LEADERBOARD_ENGINE == 'numpy':
+            if not score_engine.loaded:
+                await run_db(score_engine.load)
+            if config.SCORE_ENGINE_RELOAD_INTERVAL:
+                self.score_engine_reloader.change_interval(seconds = config.SCORE_ENGINE_RELOAD_INTERVAL)
+                self.score_engine_reloader.start()
+        # Snapshots live in the shared database, so only one process of a cluster refreshes them
+        if config.LEADERBOARD_SNAPSHOTS and config.CLUSTER_ID == 0:
+            self.snapshot_refresher.start()
+
+    async def cog_unload(self) -> None:
+        self.snapshot_refresher.cancel()
+        self.score_engine_reloader.cancel()
+        await self.avatar_cache.close()
+
+    @tasks.loop(seconds = config.LEADERBOARD_SNAPSHOT_INTERVAL)
+    async def snapshot_refresher(self) -> None:
+        if await run_db(refresh_snapshots) is not None:
+            leaderboard_cache.bump_all()
+
+    @tasks.loop(hours = 1)
+    async def score_engine_reloader(self) -> None:
+        # The engine only sees submissions accepted by this process, so reload it to pick up the rest of the cluster's
+        if self.score_engine_reloader.current_loop == 0:
+            return
+        if await run_db(score_engine.load):
+            leaderboard_cache.bump(GLOBAL_SCOPE)
+
+    @staticmethod
+    def ranked_query(session, period: str, filter_server_id: int | None = None, display_server_id: int | None = None):
+        # RANK() gives tied users the same rank everywhere: on every page and in the caller's own row
+        pst_time: datetime = datetime.now(ZoneInfo('America/Los_Angeles'))
+        date_range = period_range(period, pst_time.date())
+
+        if period == 'daily':
+            score_expr = func.max(WordleData.wordle_score)
+            query = session.query(
+                func.rank().over(order_by = score_expr).label('rank'),
+                User.user_id,
+                score_expr.label('score'),
+                func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
+                User.avatar
+            ).join(WordleData, User.user_id == WordleData.user_id)
+        else:
+            score_expr = func.avg(WordleData.wordle_score)
+            query = session.query(
+                func.rank().over(order_by = score_expr).label('rank'),
+                User.user_id,
+                score_expr.label('score'),
+                func.count(WordleData.wordle_id).label('games_played'),
+                func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
+                User.avatar
+            ).join(WordleData, User.user_id == WordleData.user_id)
+        if filter_server_id is not None:
+            query = query.join(
+                ServerMembership,
+                (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == filter_server_id)
+            )
+        elif display_server_id is not None:
+            query = query.outerjoin(
+                ServerMembership,
+                (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
+            )
+        if date_range is not None:
+            query = query.filter(WordleData.wordle_date >= date_range[0], WordleData.wordle_date < date_range[1])
+        query = query.group_by(User.user_id, User.user_name, User.avatar, ServerMembership.display_name)
+        return query.cte('ranked')
+
+    @staticmethod
+    def snapshot_query(session, period: str, filter_server_id: int | None = None, display_server_id: int | None = None):
+        # Same columns as ranked_query, read from the last background refresh instead of aggregating wordle_data
+        columns = [
+            LeaderboardSnapshot.rank,
+            LeaderboardSnapshot.user_id,
+            cast(LeaderboardSnapshot.score, Integer).label('score') if period == 'daily' else LeaderboardSnapshot.score
+        ]
+        if period != 'daily':
+            columns.append(LeaderboardSnapshot.games_played)
+        query = session.query(
+            *columns,
+            func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
+            User.avatar
+        ).join(User, User.user_id == LeaderboardSnapshot.user_id).outerjoin(
+            ServerMembership,
+            (ServerMembership.user_id == LeaderboardSnapshot.user_id) & (ServerMembership.server_id == display_server_id)
+        ).filter(
+            LeaderboardSnapshot.scope_id == (GLOBAL_SCOPE_ID if filter_server_id is None else filter_server_id),
+            LeaderboardSnapshot.period == period
+        )
+        return query.cte('ranked')
+
+    @staticmethod
+    def snapshot_is_current(period: str, refreshed_at: datetime) -> bool:
+        # refreshed_at is when the refresh read wordle_data (UTC); a snapshot read before the current period began
+        # still holds the previous day's, week's, month's or year's ranking
+        date_range = period_range(period, datetime.now(ZoneInfo('America/Los_Angeles')).date())
+        if date_range is None:
+            return True
+        return refreshed_at.replace(tzinfo = timezone.utc).astimezone(ZoneInfo('America/Los_Angeles')).date() >= date_range[0]
+
+    @classmethod
+    def get_leaderboard(cls, period: str, filter_server_id: int | None = None, display_server_id: int | None = None, limit: int = PAGE_SIZE, after: tuple | None = None, user_id: int | None = None) -> tuple[list, tuple | None, datetime | None] | None:
+        # Rows come back ordered by (score, user_id); passing the last row's (score, user_id) as after seeks to the next page.
+        # When user_id is given, that user's ranked row is fetched by the same statement.
+        if filter_server_id is None and config.LEADERBOARD_ENGINE == 'numpy' and score_engine.loaded:
+            return cls.get_engine_leaderboard(period, display_server_id, limit, after, user_id)
 
-    def get_user_rank(self, period: str, user_id: int, filter_server_id: int | None = None, display_server_id: int | None = None) -> tuple | None:
         session = get_session()
         try:
-            pst_time: datetime = datetime.now(ZoneInfo('America/Los_Angeles'))
-            today_date = pst_time.date()
-            week = int(today_date.strftime('%U'))
-            month = today_date.month
-            year = today_date.year
-
-            if period == 'daily':
-                score_expr = case(
-                    (WordleData.wordle_score == 'X', 10),
-                    else_ = cast(WordleData.wordle_score, Integer)
-                )
-                base_query = session.query(
-                    User.user_id,
-                    func.max(score_expr).label('score')
-                ).join(WordleData, User.user_id == WordleData.user_id)
-                if filter_server_id is not None:
-                    base_query = base_query.join(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == filter_server_id)
-                    )
-                elif display_server_id is not None:
-                    base_query = base_query.outerjoin(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
-                    )
-                base_query = base_query.filter(WordleData.wordle_date == today_date)
-                base_query = base_query.group_by(User.user_id)
-                user_score = base_query.filter(User.user_id == user_id).with_entities(func.max(score_expr)).scalar()
-                if user_score is None:
-                    return None
-                count_better = base_query.filter(func.max(score_expr) < user_score).count()
-                rank = count_better + 1
-                user_obj = session.query(User).filter(User.user_id == user_id).first()
-                display_name = user_obj.user_name if user_obj else ''
-                avatar = user_obj.avatar if user_obj else ''
-                return (rank, user_score, display_name, avatar)
+            refreshed_at = None
+            if config.LEADERBOARD_SNAPSHOTS and period in SNAPSHOT_PERIODS:
+                refreshed_at = session.query(LeaderboardSnapshotMeta.refreshed_at).filter(LeaderboardSnapshotMeta.period == period).scalar()
+            # Until the first refresh has finished, and until the first one after a period rolls over, boards are aggregated live
+            if refreshed_at is not None and cls.snapshot_is_current(period, refreshed_at):
+                ranked = cls.snapshot_query(session, period, filter_server_id, display_server_id)
             else:
-                base_query = session.query(
-                    User.user_id,
-                    func.avg(
-                        case(
-                            (WordleData.wordle_score == 'X', 10),
-                            else_ = cast(WordleData.wordle_score, Integer)
-                        )
-                    ).label('average_score'),
-                    func.count(WordleData.wordle_id).label('games_played'),
-                    func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
-                    User.avatar
-                ).join(WordleData, User.user_id == WordleData.user_id)
-                if filter_server_id is not None:
-                    base_query = base_query.join(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == filter_server_id)
-                    )
-                elif display_server_id is not None:
-                    base_query = base_query.outerjoin(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
-                    )
-                if period == 'weekly':
-                    base_query = base_query.filter(
-                        func.WEEK(WordleData.wordle_date, 0) == int(week),
-                        func.YEAR(WordleData.wordle_date) == year
-                    )
-                elif period == 'monthly':
-                    base_query = base_query.filter(
-                        func.MONTH(WordleData.wordle_date) == month,
-                        func.YEAR(WordleData.wordle_date) == year
-                    )
-                elif period == 'yearly':
-                    base_query = base_query.filter(func.YEAR(WordleData.wordle_date) == year)
-                base_query = base_query.group_by(User.user_id, User.user_name, User.avatar, ServerMembership.display_name)
-                user_record = base_query.filter(User.user_id == user_id).first()
-                if not user_record:
-                    return None
-                user_avg = user_record.average_score
-                subq = base_query.subquery()
-                count_query = session.query(func.count()).select_from(subq).filter(subq.c.average_score < user_avg)
-                count_better = count_query.scalar() or 0
-                rank = count_better + 1
-                return (rank, user_avg, user_record.games_played, user_record.display_name, user_record.avatar)
+                ranked = cls.ranked_query(session, period, filter_server_id, display_server_id)
+            columns = [column for column in ranked.c]
+
+            page_query = session.query(*columns, literal_column('0').label('is_caller'))
+            if after is not None:
+                page_query = page_query.filter(tuple_(ranked.c.score, ranked.c.user_id) > tuple_(*after))
+            # Selected through a subquery so the LIMIT isn't attached to a bare UNION ALL member, which SQLite rejects
+            page = page_query.order_by(ranked.c.score, ranked.c.user_id).limit(limit).subquery('page')
+            page_query = session.query(*page.c)
+            if user_id is not None:
+                caller_query = session.query(*columns, literal_column('1').label('is_caller')).filter(ranked.c.user_id == user_id)
+                page_query = page_query.union_all(caller_query)
+
+            rows, user_record = [], None
+            for row in page_query.all():
+                if row.is_caller:
+                    user_record = tuple(row[:-1])
+                else:
+                    rows.append(tuple(row[:-1]))
+            rows.sort(key = lambda r: (r[2], r[1]))
+            return rows, user_record, refreshed_at
+        except SQLAlchemyError as e:
+            print(f'Database error: {e}')
+            return None
         finally:
             session.close()
 
     @staticmethod
-    def get_leaderboard(period: str, filter_server_id: int | None = None, display_server_id: int | None = None) -> list:
+    def get_engine_leaderboard(period: str, display_server_id: int | None = None, limit: int = PAGE_SIZE, after: tuple | None = None, user_id: int | None = None) -> tuple[list, tuple | None, None] | None:
+        # Global boards ranked in memory by the score engine; only the names and avatars of the returned rows come from SQL
+        pst_time: datetime = datetime.now(ZoneInfo('America/Los_Angeles'))
+        engine_rows, engine_user_record = score_engine.leaderboard(period, pst_time.date(), limit, after, user_id)
+        user_ids = {row[1] for row in engine_rows}
+        if engine_user_record is not None:
+            user_ids.add(engine_user_record[1])
+        if not user_ids:
+            return [], None, None
+
         session = get_session()
         try:
-            pst_time: datetime = datetime.now(ZoneInfo('America/Los_Angeles'))
-            today_date = pst_time.date()
-            week = int(today_date.strftime('%U'))
-            month = today_date.month
-            year = today_date.year
-
-            if period == 'daily':
-                score_expr = case(
-                    (WordleData.wordle_score == 'X', 10),
-                    else_ = cast(WordleData.wordle_score, Integer)
-                )
-                query = session.query(
-                    User.user_id,
-                    func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
-                    User.avatar,
-                    func.max(score_expr).label('score')
-                ).join(WordleData, User.user_id == WordleData.user_id)
-                if filter_server_id is not None:
-                    query = query.join(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == filter_server_id)
-                    )
-                elif display_server_id is not None:
-                    query = query.outerjoin(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
-                    )
-                query = query.filter(WordleData.wordle_date == today_date)
-                query = query.group_by(User.user_id, User.user_name, User.avatar, ServerMembership.display_name)
-                query = query.order_by('score')
-                all_data = query.all()
-                return all_data[:100]
-            else:
-                query = session.query(
-                    User.user_id,
-                    func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
-                    User.avatar,
-                    func.avg(
-                        case(
-                            (WordleData.wordle_score == 'X', 10),
-                            else_ = cast(WordleData.wordle_score, Integer)
-                        )
-                    ).label('average_score'),
-                    func.count(WordleData.wordle_id).label('games_played')
-                ).join(WordleData, User.user_id == WordleData.user_id)
-                if filter_server_id is not None:
-                    query = query.join(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == filter_server_id)
-                    )
-                elif display_server_id is not None:
-                    query = query.outerjoin(
-                        ServerMembership,
-                        (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
-                    )
-                if period == 'weekly':
-                    query = query.filter(
-                        func.WEEK(WordleData.wordle_date, 0) == int(week),
-                        func.YEAR(WordleData.wordle_date) == year
-                    )
-                elif period == 'monthly':
-                    query = query.filter(
-                        func.MONTH(WordleData.wordle_date) == month,
-                        func.YEAR(WordleData.wordle_date) == year
-                    )
-                elif period == 'yearly':
-                    query = query.filter(func.YEAR(WordleData.wordle_date) == year)
-                query = query.group_by(User.user_id, User.user_name, User.avatar, ServerMembership.display_name)
-                query = query.order_by('average_score')
-                all_data = query.all()
-                return all_data[:100]
+            profiles = {row.user_id: (row.display_name, row.avatar) for row in session.query(
+                User.user_id,
+                func.coalesce(ServerMembership.display_name, User.user_name).label('display_name'),
+                User.avatar
+            ).outerjoin(
+                ServerMembership,
+                (ServerMembership.user_id == User.user_id) & (ServerMembership.server_id == display_server_id)
+            ).filter(User.user_id.in_(user_ids)).all()}
+
+            def shape(row: tuple) -> tuple:
+                rank, row_user_id, score, games_played = row
+                display_name, avatar = profiles.get(row_user_id, ('', ''))
+                if period == 'daily':
+                    return (rank, row_user_id, score, display_name, avatar)
+                return (rank, row_user_id, score, games_played, display_name, avatar)
+
+            user_record = shape(engine_user_record) if engine_user_record is not None else None
+            return [shape(row) for row in engine_rows], user_record, None
         except SQLAlchemyError as e:
             print(f'Database error: {e}')
-            return []
+            return None
         finally:
             session.close()
 
+    @staticmethod
+    def board_filters(board_key: tuple) -> tuple[str, int | None, int | None]:
+        scope, _, period, _, display_server_id = board_key
+        filter_server_id = None if scope == GLOBAL_SCOPE else scope
+        return period, filter_server_id, display_server_id
+
+    async def load_rows(self, board_key: tuple, board: dict, count: int, user_id: int | None = None) -> None:
+        # Fetch just enough rows past the last one already held for the board to contain count rows,
+        # along with the rank of user_id if the board doesn't know it yet
+        ranked_data = board['rows']
+        limit = 0 if board['exhausted'] else max(count - len(ranked_data), 0)
+        if user_id in board['ranks']:
+            user_id = None
+        if limit == 0 and user_id is None:
+            return
+
+        period, filter_server_id, display_server_id = self.board_filters(board_key)
+        after = (ranked_data[-1][2], ranked_data[-1][1]) if ranked_data else None
+        loaded_count = len(ranked_data)
+        result = await run_db(self.get_leaderboard, period, filter_server_id = filter_server_id, display_server_id = display_server_id, limit = limit, after = after, user_id = user_id)
+        if result is None:
+            return
+        raw_data, user_record, board['refreshed_at'] = result
+
+        if user_id is not None:
+            board['ranks'][user_id] = user_record
+        # Another page request may have extended the board while this one was waiting on the database
+        if limit == 0 or len(ranked_data) != loaded_count:
+            return
+        ranked_data.extend(raw_data)
+        board['exhausted'] = len(raw_data) < limit
+
+    async def get_board(self, board_key: tuple, user_id: int) -> tuple[dict, tuple | None]:
+        board = leaderboard_cache.get_board(board_key)
+        if board is None:
+            board = leaderboard_cache.put_board(board_key, [])
+        # One row past the first page tells the view whether there is a next page
+        await self.load_rows(board_key, board, PAGE_SIZE + 1, user_id)
+        return board, board['ranks'].get(user_id)
+
     @commands.command()
     async def leaderboard(self, ctx: commands.Context, *, message: str = 'all time') -> None:
         period = message.lower()
@@ -189,20 +252,11 @@ class Leaderboard(commands.Cog):
         server_id = server.id
         server_name = server.name
 
-        raw_data = self.get_leaderboard(period, filter_server_id = server_id, display_server_id = server_id)
-        if period == 'daily':
-            ranked_data = [(i + 1, row[0], row[3], row[1], row[2]) for i, row in enumerate(raw_data)]
-        else:
-            ranked_data = [(i + 1, row[0], row[3], row[4], row[1], row[2]) for i, row in enumerate(raw_data)]
-
-        user_record = next((r for r in ranked_data if r[1] == ctx.author.id), None)
-        if not user_record:
-            user_record = self.get_user_rank(period, ctx.author.id, filter_server_id = server_id, display_server_id = server_id)
+        board_key = leaderboard_cache.board_key(server_id, period, server_id)
+        board, user_record = await self.get_board(board_key, ctx.author.id)
 
-        forcibly_append = False
-        if user_record and isinstance(user_record, tuple) and user_record[0] <= 100:
-            if user_record[0] > 10:
-                forcibly_append = True
+        # Ties share a rank, so whether the caller made the first page is decided by position rather than rank
+        forcibly_append = bool(user_record) and all(r[1] != ctx.author.id for r in board['rows'][:PAGE_SIZE])
 
         display_period = period.capitalize()
         embed = discord.Embed(
@@ -210,43 +264,21 @@ class Leaderboard(commands.Cog):
             title = f'{display_period} leaderboard in {server_name}'
         )
 
-        image_file = await self.leaderboard_image(ctx, ranked_data, display_period, page = 0, forcibly_append = forcibly_append)
+        image_file = await self.leaderboard_image(ctx, board_key, board, user_record, display_period, page = 0, forcibly_append = forcibly_append)
         embed.set_image(url = f'attachment://leaderboard_0.png')
 
-        if user_record:
-            if period == 'daily':
-                rank, _, score, display_name, u_avatar = user_record
-                embed.set_footer(
-                    text = f'Your rank: {rank}  |  Score: {score}',
-                    icon_url = u_avatar
-                )
-            else:
-                rank, _, u_avg, u_games, display_name, u_avatar = user_record
-                embed.set_footer(
-                    text = f'Your rank: {rank}  |  Average: {u_avg:.2f}  |  Games: {u_games}',
-                    icon_url = u_avatar
-                )
+        self.set_footer(embed, period, board, user_record)
 
-        view = self.LeaderboardView(ranked_data, display_period, ctx.author, self, forcibly_append)
+        view = self.LeaderboardView(board_key, board, user_record, display_period, ctx.author, self, forcibly_append)
         await ctx.send(file = image_file, embed = embed, view = view)
 
     @commands.command()
     async def gleaderboard(self, ctx: commands.Context, *, message: str = 'all time') -> None:
         period = message.lower()
-        raw_data = self.get_leaderboard(period, filter_server_id = None, display_server_id = ctx.guild.id)
-        if period == 'daily':
-            ranked_data = [(i + 1, row[0], row[3], row[1], row[2]) for i, row in enumerate(raw_data)]
-        else:
-            ranked_data = [(i + 1, row[0], row[3], row[4], row[1], row[2]) for i, row in enumerate(raw_data)]
+        board_key = leaderboard_cache.board_key(GLOBAL_SCOPE, period, ctx.guild.id)
+        board, user_record = await self.get_board(board_key, ctx.author.id)
 
-        user_record = next((r for r in ranked_data if r[1] == ctx.author.id), None)
-        if not user_record:
-            user_record = self.get_user_rank(period, ctx.author.id, filter_server_id = None, display_server_id = ctx.guild.id)
-
-        forcibly_append = False
-        if user_record and isinstance(user_record, tuple) and user_record[0] <= 100:
-            if user_record[0] > 10:
-                forcibly_append = True
+        forcibly_append = bool(user_record) and all(r[1] != ctx.author.id for r in board['rows'][:PAGE_SIZE])
 
         display_period = period.capitalize()
         embed = discord.Embed(
@@ -254,280 +286,82 @@ class Leaderboard(commands.Cog):
             title = f'{display_period} leaderboard globally'
         )
 
-        image_file = await self.leaderboard_image(ctx, ranked_data, display_period, page = 0, forcibly_append = forcibly_append)
+        image_file = await self.leaderboard_image(ctx, board_key, board, user_record, display_period, page = 0, forcibly_append = forcibly_append)
         embed.set_image(url = f'attachment://leaderboard_0.png')
 
+        self.set_footer(embed, period, board, user_record)
+
+        view = self.LeaderboardView(board_key, board, user_record, display_period, ctx.author, self, forcibly_append)
+        await ctx.send(file = image_file, embed = embed, view = view)
+
+    @staticmethod
+    def set_footer(embed: discord.Embed, period: str, board: dict, user_record: tuple | None) -> None:
+        footer_text = []
+        u_avatar = None
         if user_record:
             if period == 'daily':
                 rank, _, score, display_name, u_avatar = user_record
-                embed.set_footer(
-                    text = f'Your rank: {rank}  |  Score: {score}',
-                    icon_url = u_avatar
-                )
+                footer_text.append(f'Your rank: {rank}  |  Score: {score}')
             else:
                 rank, _, u_avg, u_games, display_name, u_avatar = user_record
-                embed.set_footer(
-                    text = f'Your rank: {rank}  |  Average: {u_avg:.2f}  |  Games: {u_games}',
-                    icon_url = u_avatar
-                )
-
-        view = self.LeaderboardView(ranked_data, display_period, ctx.author, self, forcibly_append)
-        await ctx.send(file = image_file, embed = embed, view = view)
-
-    def shorten_text(self, draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, max_width: int) -> str:
-        if draw.textlength(text, font = font) <= max_width:
-            return text
-        ellipsis = '...'
-        ellipsis_width = draw.textlength(ellipsis, font = font)
-        available_width = max_width - ellipsis_width
-        for i in range(len(text), 0, -1):
-            if draw.textlength(text[:i], font = font) <= available_width:
-                return text[:i] + ellipsis
-        return ellipsis
-
-    async def leaderboard_image(self, ctx_or_interaction, leaderboard_data: list, period: str, page: int = 0, forcibly_append: bool = False) -> discord.File:
+                footer_text.append(f'Your rank: {rank}  |  Average: {u_avg:.2f}  |  Games: {u_games}')
+        if board['refreshed_at'] is not None:
+            refreshed_at = board['refreshed_at'].replace(tzinfo = timezone.utc).astimezone(ZoneInfo('America/Los_Angeles'))
+            footer_text.append(f'Updated {refreshed_at:%I:%M %p} PT')
+        if footer_text:
+            embed.set_footer(text = '  |  '.join(footer_text), icon_url = u_avatar)
+
+    async def get_avatars(self, page_entries: list) -> list[Image.Image]:
+        avatar_urls = []
+        for entry in page_entries:
+            user_obj = self.bot.get_user(entry[1])
+            fallback_avatar_url = user_obj.display_avatar.replace(format = 'png').url if user_obj else None
+            avatar_urls.append((entry[-1], fallback_avatar_url))
+        return await self.avatar_cache.get_many(avatar_urls)
+
+    async def leaderboard_image(self, ctx_or_interaction, board_key: tuple, board: dict, user_record: tuple | None, period: str, page: int = 0, forcibly_append: bool = False) -> discord.File:
         if isinstance(ctx_or_interaction, discord.Interaction):
             current_user = ctx_or_interaction.user
         else:
             current_user = ctx_or_interaction.author
 
+        # Loaded even on a cached page so the view can tell whether there is a page after it
+        await self.load_rows(board_key, board, (page + 1) * PAGE_SIZE + 1)
+        png = leaderboard_cache.get_page(board_key, page, current_user.id, forcibly_append)
+        if png is not None:
+            return discord.File(fp = BytesIO(png), filename = f'leaderboard_{page}.png')
+
         is_daily = (period.lower() == 'daily')
-        user_in_top = next((r for r in leaderboard_data if r[1] == current_user.id), None)
+        leaderboard_data = board['rows']
 
-        max_rows = 10
-        if forcibly_append and user_in_top and user_in_top[0] > 10 and page == 0:
-            page_entries = leaderboard_data[:max_rows - 1] + [user_in_top]
-        else:
-            start_index = page * max_rows
-            page_entries = leaderboard_data[start_index:start_index + max_rows]
-
-        row_height = 110
-        header_height = 70
-        total_rows = len(page_entries)
-        large_width = 1600
-        large_height = header_height + 20 + row_height * total_rows + 20
-
-        white = (255, 255, 255)
-        transparent = (0, 0, 0, 0)
-        img = Image.new('RGBA', (large_width, large_height), transparent)
-        draw = ImageDraw.Draw(img)
-
-        top_margin = 0
-        if is_daily:
-            col_rank_x = 40
-            col_avatar_x = 180
-            avatar_size = 100
-            col_name_x = 300
-            name_column_width = 1070
-            col_score_x = 1370
-            score_column_width = 200
-
-            bold_font = ImageFont.truetype('assets/whitneybold.otf', 60)
-            regular_font = ImageFont.truetype('assets/whitneymedium.otf', 60)
-            rank_header_text = 'Rank'
-            rank_header_w = draw.textlength(rank_header_text, font = bold_font)
-            rank_header_x = col_rank_x + ((col_avatar_x - col_rank_x) - rank_header_w) / 2
-            draw.text((rank_header_x, top_margin), rank_header_text, font = bold_font, fill = white)
-
-            draw.text((col_name_x, top_margin), 'Player', font = bold_font, fill = white)
-
-            score_header_text = 'Score'
-            score_header_w = draw.textlength(score_header_text, font = bold_font)
-            score_header_x = col_score_x + (score_column_width - score_header_w) / 2
-            draw.text((score_header_x, top_margin), score_header_text, font = bold_font, fill = white)
-        else:
-            col_rank_x = 40
-            col_avatar_x = 180
-            avatar_size = 100
-            col_name_x = 300
-            name_column_width = 800
-            col_average_x = 1100
-            average_column_width = 180
-            col_games_x = 1370
-            games_column_width = 200
-
-            bold_font = ImageFont.truetype('assets/whitneybold.otf', 60)
-            regular_font = ImageFont.truetype('assets/whitneymedium.otf', 60)
-            rank_header_text = 'Rank'
-            rank_header_w = draw.textlength(rank_header_text, font = bold_font)
-            rank_header_x = col_rank_x + ((col_avatar_x - col_rank_x) - rank_header_w) / 2
-            draw.text((rank_header_x, top_margin), rank_header_text, font = bold_font, fill = white)
-
-            draw.text((col_name_x, top_margin), 'Player', font = bold_font, fill = white)
-
-            avg_header_text = 'Average'
-            avg_header_w = draw.textlength(avg_header_text, font = bold_font)
-            avg_header_x = col_average_x + (average_column_width - avg_header_w) / 2
-            draw.text((avg_header_x, top_margin), avg_header_text, font = bold_font, fill = white)
-
-            games_header_text = 'Games'
-            games_header_w = draw.textlength(games_header_text, font = bold_font)
-            games_header_x = col_games_x + (games_column_width - games_header_w) / 2
-            draw.text((games_header_x, top_margin), games_header_text, font = bold_font, fill = white)
-
-        line_y = header_height
-        draw.line([(40, line_y), (large_width - 40, line_y)], fill = white, width = 4)
-
-        if is_daily:
-            bold_font = ImageFont.truetype('assets/whitneybold.otf', 60)
-            regular_font = ImageFont.truetype('assets/whitneymedium.otf', 60)
-            rank_texts = [f'{entry[0]}.' for entry in page_entries]
-            max_rank_width = max(draw.textlength(text, font = bold_font) for text in rank_texts) if rank_texts else 0
-            rank_column_width = col_avatar_x - 40
-            rank_left_x = 40 + (rank_column_width - max_rank_width) / 2
-
-            y_offset = line_y + 20
-            for entry in page_entries:
-                rank, user_id, score, display_name, avatar_url = entry
-                rank_text = f'{rank}.'
-                draw.text((rank_left_x, y_offset + 20), rank_text, font = bold_font, fill = white)
-                try:
-                    if avatar_url:
-                        response = requests.get(avatar_url)
-                        avatar_img = Image.open(BytesIO(response.content)).convert('RGBA')
-                    else:
-                        raise ValueError('No stored avatar URL.')
-                    avatar_img = avatar_img.resize((avatar_size, avatar_size))
-                    mask = Image.new('L', (avatar_size, avatar_size), 0)
-                    mask_draw = ImageDraw.Draw(mask)
-                    mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                    img.paste(avatar_img, (col_avatar_x, y_offset + 5), mask)
-                except Exception:
-                    user_obj = self.bot.get_user(user_id)
-                    if user_obj:
-                        fallback_avatar_url = user_obj.display_avatar.replace(format = 'png').url
-                        try:
-                            response = requests.get(fallback_avatar_url)
-                            avatar_img = Image.open(BytesIO(response.content)).convert('RGBA')
-                            avatar_img = avatar_img.resize((avatar_size, avatar_size))
-                            mask = Image.new('L', (avatar_size, avatar_size), 0)
-                            mask_draw = ImageDraw.Draw(mask)
-                            mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                            img.paste(avatar_img, (col_avatar_x, y_offset + 5), mask)
-                        except Exception:
-                            default_avatar = Image.open('assets/default_avatar.png').convert('RGBA')
-                            default_avatar = default_avatar.resize((avatar_size, avatar_size))
-                            mask = Image.new('L', (avatar_size, avatar_size), 0)
-                            mask_draw = ImageDraw.Draw(mask)
-                            mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                            img.paste(default_avatar, (col_avatar_x, y_offset + 5), mask)
-                    else:
-                        default_avatar = Image.open('assets/default_avatar.png').convert('RGBA')
-                        default_avatar = default_avatar.resize((avatar_size, avatar_size))
-                        mask = Image.new('L', (avatar_size, avatar_size), 0)
-                        mask_draw = ImageDraw.Draw(mask)
-                        mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                        img.paste(default_avatar, (col_avatar_x, y_offset + 5), mask)
-
-                if user_id == current_user.id:
-                    name_font = bold_font
-                    stats_font = bold_font
-                else:
-                    name_font = regular_font
-                    stats_font = regular_font
-
-                if len(display_name) > 32:
-                    display_name = display_name[:32]
-                name_max_width = name_column_width - 20
-                display_name = self.shorten_text(draw, display_name, name_font, name_max_width)
-                draw.text((col_name_x, y_offset + 25), display_name, font = name_font, fill = white)
-
-                score_str = str(score)
-                score_w = draw.textlength(score_str, font = stats_font)
-                score_x = col_score_x + (score_column_width - score_w) / 2
-                draw.text((score_x, y_offset + 25), score_str, font = stats_font, fill = white)
-                y_offset += row_height
+        if forcibly_append and user_record and page == 0:
+            page_entries = leaderboard_data[:PAGE_SIZE - 1] + [user_record]
         else:
-            bold_font = ImageFont.truetype('assets/whitneybold.otf', 60)
-            regular_font = ImageFont.truetype('assets/whitneymedium.otf', 60)
-            rank_texts = [f'{entry[0]}.' for entry in page_entries]
-            max_rank_width = max(draw.textlength(text, font = bold_font) for text in rank_texts) if rank_texts else 0
-            rank_column_width = col_avatar_x - 40
-            rank_left_x = 40 + (rank_column_width - max_rank_width) / 2
-
-            games_texts = [str(entry[3]) for entry in page_entries]
-            max_games_width = max(draw.textlength(text, font = regular_font) for text in games_texts) if games_texts else 0
-            games_left_x = col_games_x + (games_column_width - max_games_width) / 2
-
-            y_offset = line_y + 20
-            for entry in page_entries:
-                rank, user_id, avg_score, games_played, display_name, avatar_url = entry
-                rank_text = f'{rank}.'
-                draw.text((rank_left_x, y_offset + 20), rank_text, font = bold_font, fill = white)
-                try:
-                    if avatar_url:
-                        response = requests.get(avatar_url)
-                        avatar_img = Image.open(BytesIO(response.content)).convert('RGBA')
-                    else:
-                        raise ValueError('No stored avatar URL.')
-                    avatar_img = avatar_img.resize((avatar_size, avatar_size))
-                    mask = Image.new('L', (avatar_size, avatar_size), 0)
-                    mask_draw = ImageDraw.Draw(mask)
-                    mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                    img.paste(avatar_img, (col_avatar_x, y_offset + 5), mask)
-                except Exception:
-                    user_obj = self.bot.get_user(user_id)
-                    if user_obj:
-                        fallback_avatar_url = user_obj.display_avatar.replace(format = 'png').url
-                        try:
-                            response = requests.get(fallback_avatar_url)
-                            avatar_img = Image.open(BytesIO(response.content)).convert('RGBA')
-                            avatar_img = avatar_img.resize((avatar_size, avatar_size))
-                            mask = Image.new('L', (avatar_size, avatar_size), 0)
-                            mask_draw = ImageDraw.Draw(mask)
-                            mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                            img.paste(avatar_img, (col_avatar_x, y_offset + 5), mask)
-                        except Exception:
-                            default_avatar = Image.open('assets/default_avatar.png').convert('RGBA')
-                            default_avatar = default_avatar.resize((avatar_size, avatar_size))
-                            mask = Image.new('L', (avatar_size, avatar_size), 0)
-                            mask_draw = ImageDraw.Draw(mask)
-                            mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                            img.paste(default_avatar, (col_avatar_x, y_offset + 5), mask)
-                    else:
-                        default_avatar = Image.open('assets/default_avatar.png').convert('RGBA')
-                        default_avatar = default_avatar.resize((avatar_size, avatar_size))
-                        mask = Image.new('L', (avatar_size, avatar_size), 0)
-                        mask_draw = ImageDraw.Draw(mask)
-                        mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill = 255)
-                        img.paste(default_avatar, (col_avatar_x, y_offset + 5), mask)
-
-                if user_id == current_user.id:
-                    name_font = bold_font
-                    stats_font = bold_font
-                else:
-                    name_font = regular_font
-                    stats_font = regular_font
-
-                if len(display_name) > 32:
-                    display_name = display_name[:32]
-                name_max_width = name_column_width - 20
-                display_name = self.shorten_text(draw, display_name, name_font, name_max_width)
-                draw.text((col_name_x, y_offset + 25), display_name, font = name_font, fill = white)
-
-                avg_str = f'{avg_score:.2f}'
-                avg_w = draw.textlength(avg_str, font = stats_font)
-                avg_x = col_average_x + (average_column_width - avg_w) / 2
-                draw.text((avg_x, y_offset + 25), avg_str, font = stats_font, fill = white)
+            start_index = page * PAGE_SIZE
+            page_entries = leaderboard_data[start_index:start_index + PAGE_SIZE]
+        avatars = await self.get_avatars(page_entries)
 
-                games_str = str(games_played)
-                draw.text((games_left_x, y_offset + 25), games_str, font = regular_font, fill = white)
-                y_offset += row_height
-
-        buf = BytesIO()
-        img.save(buf, format = 'PNG', optimize = True)
-        buf.seek(0)
-        return discord.File(fp = buf, filename = f'leaderboard_{page}.png')
+        png = await render_pool.render(render_leaderboard, page_entries, [avatar.tobytes() for avatar in avatars], is_daily, current_user.id)
+        leaderboard_cache.put_page(board_key, page, current_user.id, forcibly_append, png)
+        return discord.File(fp = BytesIO(png), filename = f'leaderboard_{page}.png')
 
     class LeaderboardView(discord.ui.View):
-        def __init__(self, leaderboard_data: list, period: str, author: discord.User, cog_instance, forcibly_append: bool, current_page: int = 0):
+        def __init__(self, board_key: tuple, board: dict, user_record: tuple | None, period: str, author: discord.User, cog_instance, forcibly_append: bool, current_page: int = 0):
             super().__init__(timeout = 180)
-            self.leaderboard_data = leaderboard_data
+            self.board_key = board_key
+            self.board = board
+            self.user_record = user_record
             self.period = period
             self.author = author
             self.cog_instance = cog_instance
             self.forcibly_append = forcibly_append
             self.current_page = current_page
+            self.left.disabled = (current_page == 0)
+            self.right.disabled = not self.has_next_page()
+
+        def has_next_page(self) -> bool:
+            # Pages are loaded one row ahead, so a row past this page means there is another one to show
+            return len(self.board['rows']) > (self.current_page + 1) * PAGE_SIZE
 
         @discord.ui.button(label = '←', style = discord.ButtonStyle.gray)
         async def left(self, interaction: discord.Interaction, button: discord.ui.Button):
@@ -539,27 +373,18 @@ class Leaderboard(commands.Cog):
 
         @discord.ui.button(label = '→', style = discord.ButtonStyle.gray)
         async def right(self, interaction: discord.Interaction, button: discord.ui.Button):
-            total_entries = len(self.leaderboard_data) + (1 if self.forcibly_append and any(r for r in self.leaderboard_data if r[1] == self.author.id) else 0)
-            max_pages = (total_entries - 1) // 10
-            if self.current_page < max_pages:
+            if self.has_next_page():
                 self.current_page += 1
                 await self.update_leaderboard(interaction)
             else:
                 await interaction.response.defer()
 
         async def update_leaderboard(self, interaction: discord.Interaction):
-            total_entries = len(self.leaderboard_data) + (1 if self.forcibly_append and any(r for r in self.leaderboard_data if r[1] == self.author.id) else 0)
-            max_pages = (total_entries - 1) // 10
-            self.left.disabled = (self.current_page == 0)
-            self.right.disabled = (self.current_page >= max_pages)
-
-            new_image = await self.cog_instance.leaderboard_image(interaction, self.leaderboard_data, self.period, page = self.current_page, forcibly_append = self.forcibly_append)
+            new_image = await self.cog_instance.leaderboard_image(interaction, self.board_key, self.board, self.user_record, self.period, page = self.current_page, forcibly_append = self.forcibly_append)
             embed = interaction.message.embeds[0] if interaction.message.embeds else discord.Embed(title = self.period)
             embed.set_image(url = f'attachment://leaderboard_{self.current_page}.png')
 
-            new_view = type(self)(self.leaderboard_data, self.period, self.author, self.cog_instance, self.forcibly_append, self.current_page)
-            new_view.left.disabled = self.left.disabled
-            new_view.right.disabled = self.right.disabled
+            new_view = type(self)(self.board_key, self.board, self.user_record, self.period, self.author, self.cog_instance, self.forcibly_append, self.current_page)
 
             await interaction.response.edit_message(attachments = [new_image], embed = embed, view = new_view)
 
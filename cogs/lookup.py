@@ -2,9 +2,9 @@ import discord
 from discord.ext import commands
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
-from database.connection import get_session
+from database.connection import get_session, run_db
 from database.models import User, WordleData
-from util.util import send_no_games_embed
+from util.util import send_no_games_embed, score_label
 
 class Lookup(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
@@ -14,79 +14,95 @@ class Lookup(commands.Cog):
     def decode_grid(wordle_grid: str) -> str:
         return wordle_grid.replace('W', '⬜').replace('B', '⬛').replace('Y', '🟨').replace('G', '🟩')
 
-    @commands.command()
-    async def lookup(self, ctx: commands.Context, message: str) -> None:
+    @staticmethod
+    def get_wordle(user_id: int, lookup_date, wordle_id: int | None) -> tuple[bool, tuple | None] | None:
         session = get_session()
         try:
-            user = ctx.author
-            if ctx.message.mentions:
-                user = ctx.message.mentions[0]
-            user_data = session.query(User).filter(User.user_id == user.id).first()
+            user_data = session.query(User).filter(User.user_id == user_id).first()
             if user_data is None:
-                await send_no_games_embed(ctx, user)
-                return
-
-            lookup_date = None
-            if '/' in message:
-                parts = message.split('/')
-                try:
-                    if len(parts[2]) == 2:
-                        lookup_date = datetime.strptime(message, '%m/%d/%y').date()
-                    else:
-                        lookup_date = datetime.strptime(message, '%m/%d/%Y').date()
-                except (ValueError, IndexError):
-                    lookup_date = None
-            elif '-' in message:
-                parts = message.split('-')
-                try:
-                    if len(parts[2]) == 2:
-                        lookup_date = datetime.strptime(message, '%m-%d-%y').date()
-                    else:
-                        lookup_date = datetime.strptime(message, '%m-%d-%Y').date()
-                except (ValueError, IndexError):
-                    lookup_date = None
-            else:
-                message = f'{int(message):,}'
+                return False, None
 
             if lookup_date:
                 wordle_data = session.query(WordleData).filter(
-                    WordleData.user_id == user.id,
+                    WordleData.user_id == user_id,
                     WordleData.wordle_date == lookup_date
                 ).first()
             else:
                 wordle_data = session.query(WordleData).filter(
-                    WordleData.user_id == user.id,
-                    WordleData.wordle_id == message
+                    WordleData.user_id == user_id,
+                    WordleData.wordle_id == wordle_id
                 ).first()
 
             if wordle_data is None:
-                error_embed = discord.Embed(color = discord.Color.red())
-                if lookup_date:
-                    error_embed.set_author(name = f'{user.display_name} has not played Wordle on {lookup_date}', icon_url = user.avatar)
-                else:
-                    error_embed.set_author(name = f'{user.display_name} has not played Wordle {message}', icon_url = user.avatar)
-                await ctx.send(embed = error_embed)
-                return
-
-            wordle_id = wordle_data.wordle_id
-            wordle_score = wordle_data.wordle_score
-            wordle_grid = self.decode_grid(wordle_data.wordle_grid)
-            formatted_date = wordle_data.wordle_date.strftime('%m/%d/%Y')
-
-            embed = discord.Embed(
-                color = discord.Color.green(),
-                title = f'Wordle {wordle_id} {wordle_score}/6',
-                description = f'{wordle_grid}'
-            )
-            embed.set_author(name = user.display_name, icon_url = user.avatar)
-            embed.set_footer(text = formatted_date)
-
-            await ctx.send(embed = embed)
+                return True, None
+            return True, (wordle_data.wordle_id, wordle_data.wordle_score, wordle_data.wordle_grid, wordle_data.wordle_date)
 
         except SQLAlchemyError as e:
             print(f'Database error: {e}')
+            return None
         finally:
             session.close()
 
+    @commands.command()
+    async def lookup(self, ctx: commands.Context, message: str) -> None:
+        user = ctx.author
+        if ctx.message.mentions:
+            user = ctx.message.mentions[0]
+
+        lookup_date = None
+        wordle_id = None
+        if '/' in message:
+            parts = message.split('/')
+            try:
+                if len(parts[2]) == 2:
+                    lookup_date = datetime.strptime(message, '%m/%d/%y').date()
+                else:
+                    lookup_date = datetime.strptime(message, '%m/%d/%Y').date()
+            except (ValueError, IndexError):
+                lookup_date = None
+        elif '-' in message:
+            parts = message.split('-')
+            try:
+                if len(parts[2]) == 2:
+                    lookup_date = datetime.strptime(message, '%m-%d-%y').date()
+                else:
+                    lookup_date = datetime.strptime(message, '%m-%d-%Y').date()
+            except (ValueError, IndexError):
+                lookup_date = None
+        else:
+            wordle_id = int(message.replace(',', ''))
+            message = f'{wordle_id:,}'
+
+        result = await run_db(self.get_wordle, user.id, lookup_date, wordle_id)
+        if result is None:
+            return
+        user_exists, wordle_data = result
+        if not user_exists:
+            await send_no_games_embed(ctx, user)
+            return
+
+        if wordle_data is None:
+            error_embed = discord.Embed(color = discord.Color.red())
+            if lookup_date:
+                error_embed.set_author(name = f'{user.display_name} has not played Wordle on {lookup_date}', icon_url = user.avatar)
+            else:
+                error_embed.set_author(name = f'{user.display_name} has not played Wordle {message}', icon_url = user.avatar)
+            await ctx.send(embed = error_embed)
+            return
+
+        wordle_id, wordle_score, wordle_grid, wordle_date = wordle_data
+        wordle_grid = self.decode_grid(wordle_grid)
+        formatted_date = wordle_date.strftime('%m/%d/%Y')
+
+        embed = discord.Embed(
+            color = discord.Color.green(),
+            title = f'Wordle {wordle_id:,} {score_label(wordle_score)}/6',
+            description = f'{wordle_grid}'
+        )
+        embed.set_author(name = user.display_name, icon_url = user.avatar)
+        embed.set_footer(text = formatted_date)
+
+        await ctx.send(embed = embed)
+
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(Lookup(bot))
@@ -1,9 +1,15 @@
 import discord
 from discord.ext import commands
-from sqlalchemy.exc import SQLAlchemyError
-from database.connection import get_session
-from database.models import ServerData, ServerMembership
-from util.util import add_user, add_server_membership
+import asyncio
+import time
+from database.connection import run_db
+from util.util import upsert_member, member_rows, sync_server_members, rebuild_user_stats
+from util.guild_config import guild_configs
+from util.render_cache import leaderboard_cache, GLOBAL_SCOPE
+from util.stats_cache import stats_card_cache
+
+# Seconds between progress edits while syncing members, to stay clear of Discord's message edit rate limit
+MEMBER_SYNC_PROGRESS_INTERVAL = 2
 
 class Misc(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
@@ -14,12 +20,25 @@ class Misc(commands.Cog):
     async def relay_message(self, ctx: commands.Context, *, message: str) -> None:
         await ctx.send(message)
 
+    @commands.command()
+    @commands.is_owner()
+    async def rebuildstats(self, ctx: commands.Context) -> None:
+        rebuilt = await run_db(rebuild_user_stats)
+        if rebuilt is None:
+            return
+        stats_card_cache.bump_all()
+
+        rebuild_stats_embed = discord.Embed(color = discord.Color.blue(), description = f'Rebuilt stats for {rebuilt} users')
+        await ctx.send(embed = rebuild_stats_embed)
+
     @commands.command()
     async def update(self, ctx: commands.Context) -> None:
         user = ctx.author
         
-        add_user(user)
-        add_server_membership(user.id, ctx.guild.id, user.display_name)
+        if not await run_db(upsert_member, ctx.guild.id, member_rows([user])[0]):
+            return
+        leaderboard_cache.bump(GLOBAL_SCOPE)
+        leaderboard_cache.bump(ctx.guild.id)
 
         updated_user_embed = discord.Embed(color = discord.Color.blue())
         updated_user_embed.set_author(name = f'{user.display_name}\'s name and avatar has been updated', icon_url = user.avatar)
@@ -28,45 +47,37 @@ class Misc(commands.Cog):
     @commands.has_permissions(administrator = True)
     @commands.command()
     async def updateserver(self, ctx: commands.Context) -> None:
-        session = get_session()
-        try:
-            user_list = session.query(ServerMembership).filter(ServerMembership.server_id == ctx.guild.id).all()
-
-            for user in user_list:
-                if user.user_id not in [member.id for member in ctx.guild.members]:
-                    session.delete(user)
-
-            for member in ctx.guild.members:
-                add_user(member)
-                add_server_membership(member.id, ctx.guild.id, member.display_name)
-
-            session.commit()
-
-            update_server_embed = discord.Embed(color = discord.Color.blue())
-            update_server_embed.set_author(name = f'{ctx.guild.name}\'s member list has been updated', icon_url = ctx.guild.icon)
-            await ctx.send(embed = update_server_embed)
-
-        except SQLAlchemyError as e:
-            print(f'Database error: {e}')
-            session.rollback()
-
-        finally:
-            session.close()
+        members = member_rows(ctx.guild.members)
+        progress_message = await ctx.send(embed = discord.Embed(color = discord.Color.blue(), description = f'Updating {len(members)} members...'))
+
+        loop = asyncio.get_running_loop()
+        last_report = time.monotonic()
+
+        # Called from the database thread after each chunk, so edits are handed back to the event loop
+        def report_progress(done: int, total: int) -> None:
+            nonlocal last_report
+            now = time.monotonic()
+            if now - last_report < MEMBER_SYNC_PROGRESS_INTERVAL:
+                return
+            last_report = now
+            progress_embed = discord.Embed(color = discord.Color.blue(), description = f'Updating members... {done * 100 // total}%')
+            asyncio.run_coroutine_threadsafe(progress_message.edit(embed = progress_embed), loop)
+
+        synced = await run_db(sync_server_members, ctx.guild.id, members, report_progress)
+        if synced is None:
+            await progress_message.edit(embed = discord.Embed(color = discord.Color.red(), description = 'Failed to update the member list'))
+            return
+        leaderboard_cache.bump(GLOBAL_SCOPE)
+        leaderboard_cache.bump(ctx.guild.id)
+
+        added, renamed, removed = synced
+        update_server_embed = discord.Embed(color = discord.Color.blue(), description = f'{added} added  |  {renamed} renamed  |  {removed} removed')
+        update_server_embed.set_author(name = f'{ctx.guild.name}\'s member list has been updated', icon_url = ctx.guild.icon)
+        await progress_message.edit(embed = update_server_embed)
 
     @commands.command()
     async def help(self, ctx: commands.Context) -> None:
-
-        session = get_session()
-        try:
-            server = session.query(ServerData).filter(ServerData.server_id == ctx.guild.id).first()
-            prefix = server.prefix
-
-        except SQLAlchemyError as e:
-            print(f'Database error: {e}')
-            session.rollback()
-
-        finally:
-            session.close()
+        prefix = await guild_configs.get_prefix(ctx.guild.id)
 
         help_embed = discord.Embed(
             color = discord.Color.blue(),
@@ -83,6 +94,7 @@ class Misc(commands.Cog):
                 f'`{prefix}updateserver` - Update the server member list\n'
                 f'`{prefix}setprefix <new_prefix>` - Set a new command prefix (max 5 characters)\n'
                 f'`{prefix}setchannel` - Set the designated Wordle channel (Wordles will only be accepted here)\n'
+                f'`{prefix}backfill` - Import Wordles already posted in the Wordle channel (resumes where the last run stopped)\n'
 
                 f'\n`<>` = Required, `[]` = Optional, `|` = Or\n'
 
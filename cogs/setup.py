@@ -1,28 +1,61 @@
 import discord
 from discord.ext import commands
 from sqlalchemy.exc import SQLAlchemyError
-from database.connection import get_session
+from database.connection import get_session, run_db
 from database.models import ServerData
-from util.util import add_user, add_server, add_server_membership
+from util.util import add_server, member_rows, sync_server_members
+from util.guild_config import guild_configs
 
 
 class Setup(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
 
+    @staticmethod
+    def update_prefix(server_id: int, new_prefix: str) -> str | None:
+        session = get_session()
+        try:
+            server = session.query(ServerData).filter(ServerData.server_id == server_id).first()
+            old_prefix = server.prefix
+            server.prefix = new_prefix
+            session.commit()
+            return old_prefix
+
+        except SQLAlchemyError as e:
+            print(f'Database error: {e}')
+            session.rollback()
+            return None
+
+        finally:
+            session.close()
+
+    @staticmethod
+    def update_wordle_channel(server_id: int, channel_id: int) -> bool:
+        session = get_session()
+        try:
+            server_data = session.query(ServerData).filter(ServerData.server_id == server_id).first()
+            server_data.wordle_channel_id = channel_id
+            session.commit()
+            return True
+
+        except SQLAlchemyError as e:
+            print(f'Database error: {e}')
+            session.rollback()
+            return False
+
+        finally:
+            session.close()
+
     @commands.Cog.listener()
     async def on_guild_join(self, server: discord.Guild) -> None:
-        await add_server(server.id)
+        await run_db(add_server, server.id)
+        guild_configs.add_server(server.id)
 
-        for user in server.members:
-            add_user(user)
-            add_server_membership(user.id, server.id, user.display_name)
+        await run_db(sync_server_members, server.id, member_rows(server.members))
 
     @commands.has_permissions(administrator = True)
     @commands.command()
     async def setprefix(self, ctx: commands.Context, new_prefix: str) -> None:
-        session = get_session()
-
         if len(new_prefix) > 5:
             prefix_error_embed = discord.Embed(
                 color = discord.Color.red(),
@@ -30,50 +63,32 @@ class Setup(commands.Cog):
             )
             await ctx.send(embed = prefix_error_embed)
             return
-        
-        try:
-            server = session.query(ServerData).filter(ServerData.server_id == ctx.guild.id).first()
-            old_prefix = server.prefix
-            server.prefix = new_prefix
-            session.commit()
 
-            set_prefix_embed = discord.Embed(
-                color = discord.Color.blue(),
-                title = 'New prefix set',
-                description = f'Old prefix `{old_prefix}` -> New prefix `{new_prefix}`'
-            )
-            await ctx.send(embed = set_prefix_embed)
+        old_prefix = await run_db(self.update_prefix, ctx.guild.id, new_prefix)
+        if old_prefix is None:
+            return
+        await guild_configs.set_prefix(ctx.guild.id, new_prefix)
 
-        except SQLAlchemyError as e:
-            print(f'Database error: {e}')
-            session.rollback()
-            
-        finally:
-            session.close()
+        set_prefix_embed = discord.Embed(
+            color = discord.Color.blue(),
+            title = 'New prefix set',
+            description = f'Old prefix `{old_prefix}` -> New prefix `{new_prefix}`'
+        )
+        await ctx.send(embed = set_prefix_embed)
 
     @commands.has_permissions(administrator = True)
     @commands.command()
     async def setchannel(self, ctx: commands.Context) -> None:
 
         channel = ctx.channel
-        session = get_session()
-        try:
-            server_data = session.query(ServerData).filter(ServerData.server_id == ctx.guild.id).first()
-
-            server_data.wordle_channel_id = channel.id
-            session.commit()
-
-            set_channel_embed = discord.Embed(color = discord.Color.blue(), title = f'Wordle channel set to {channel.mention}')
-            set_channel_embed.set_footer(text = 'Wordle\'s will only be accepted in this channel')
-
-            await ctx.send(embed = set_channel_embed)
+        if not await run_db(self.update_wordle_channel, ctx.guild.id, channel.id):
+            return
+        await guild_configs.set_wordle_channel_id(ctx.guild.id, channel.id)
 
-        except SQLAlchemyError as e:
-            print(f'Database error: {e}')
-            session.rollback()
+        set_channel_embed = discord.Embed(color = discord.Color.blue(), title = f'Wordle channel set to {channel.mention}')
+        set_channel_embed.set_footer(text = 'Wordle\'s will only be accepted in this channel')
 
-        finally:
-            session.close()
+        await ctx.send(embed = set_channel_embed)
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(Setup(bot))
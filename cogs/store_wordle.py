@@ -1,34 +1,166 @@
 import discord
 from discord.ext import commands
-from util.util import add_user, add_server_membership, add_wordle, add_wordle_server_membership
 from zoneinfo import ZoneInfo
-from sqlalchemy.exc import SQLAlchemyError
-from database.connection import get_session
-from database.models import WordleData, ServerData, WordleServerMembership
+import config
+from database.connection import run_db
+from util.util import wordle_number, score_value, submit_wordles, get_backfill_checkpoint, save_backfill_checkpoint
+from util.guild_config import guild_configs
+from util.submission_queue import SubmissionQueue
+from util.render_cache import leaderboard_cache, GLOBAL_SCOPE
+from util.score_engine import score_engine
+from util.stats_cache import stats_card_cache
+from util.metrics import SUBMISSION_LATENCY, SUBMISSIONS, WORDLE_PREFILTER
 import re
 import random
+import time
 
+WORDLE_PATTERN = re.compile(r'^Wordle\s+(\d{1,3}(?:,\d{3})*)\s+([1-6X])\/6\s*\r?\n\r?\n((?:[⬜⬛🟨🟩]{5}\r?\n){0,5}[⬜⬛🟨🟩]{5})(?:\r?\n.*)?$')
+# \r is dropped so CRLF shares store the same '\n'-separated grid, which fits wordle_grid's 35 characters
+GRID_TRANSLATION = str.maketrans({'⬜': 'W', '⬛': 'B', '🟨': 'Y', '🟩': 'G', '\r': None})
+# The shortest share WORDLE_PATTERN accepts: 'Wordle 1 1/6', a blank line and one row of five squares
+MIN_WORDLE_LENGTH = 19
+# Wordles stored per database round trip during !backfill
+BACKFILL_CHUNK_SIZE = 500
+# Messages scanned between checkpoints when a stretch of the channel has no Wordles
+BACKFILL_CHECKPOINT_INTERVAL = 5000
+# Seconds between progress edits, to stay clear of Discord's message edit rate limit
+BACKFILL_PROGRESS_INTERVAL = 5
 
 class StoreWordle(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.submission_queue = SubmissionQueue(config.SUBMISSION_BATCH_SIZE, config.SUBMISSION_FLUSH_INTERVAL, on_commit = self.submissions_committed)
+        self.backfilling: set[int] = set()
+
+    @staticmethod
+    def submissions_committed(server_ids: set[int], stored_wordles: list[dict]) -> None:
+        score_engine.append(stored_wordles)
+        leaderboard_cache.bump(GLOBAL_SCOPE)
+        for server_id in server_ids:
+            leaderboard_cache.bump(server_id)
+
+    async def cog_load(self) -> None:
+        self.submission_queue.start()
+
+    async def cog_unload(self) -> None:
+        await self.submission_queue.stop()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
         if message.author.bot:
             return
 
-        session = get_session()
-        try:
-            server = session.query(ServerData).filter(ServerData.server_id == message.guild.id).first()
-            wordle_channel_id = server.wordle_channel_id if server else None
-        finally:
-            session.close()
+        if message.guild is None:
+            return
+
+        # Almost every message is chatter, so rule it out before touching the regex or the channel config
+        if not self.looks_like_wordle(message.content):
+            WORDLE_PREFILTER.inc(result = 'miss')
+            return
+
+        wordle_info = self.extract_wordle_info(message.content)
+        if wordle_info is None:
+            WORDLE_PREFILTER.inc(result = 'unmatched')
+            return
+        WORDLE_PREFILTER.inc(result = 'hit')
 
+        wordle_channel_id = await guild_configs.get_wordle_channel_id(message.guild.id)
         if not wordle_channel_id or message.channel.id != wordle_channel_id:
             return
 
-        await self.store_wordle_info(message)
+        await self.store_wordle_info(message, wordle_info)
+
+    @commands.has_permissions(administrator = True)
+    @commands.command()
+    async def backfill(self, ctx: commands.Context) -> None:
+        wordle_channel_id = await guild_configs.get_wordle_channel_id(ctx.guild.id)
+        channel = ctx.guild.get_channel(wordle_channel_id) if wordle_channel_id else None
+        if channel is None:
+            await ctx.send(embed = discord.Embed(color = discord.Color.red(), description = 'Set a Wordle channel before backfilling'))
+            return
+        if ctx.guild.id in self.backfilling:
+            await ctx.send(embed = discord.Embed(color = discord.Color.red(), description = 'A backfill is already running in this server'))
+            return
+
+        self.backfilling.add(ctx.guild.id)
+        try:
+            await self.run_backfill(ctx, channel)
+        finally:
+            self.backfilling.discard(ctx.guild.id)
+
+    async def run_backfill(self, ctx: commands.Context, channel: discord.TextChannel) -> None:
+        checkpoint = await run_db(get_backfill_checkpoint, ctx.guild.id, channel.id)
+        after = discord.Object(id = checkpoint[0]) if checkpoint else None
+        progress_message = await ctx.send(embed = discord.Embed(
+            color = discord.Color.blue(),
+            description = f'{"Resuming" if checkpoint else "Starting"} Wordle import from {channel.mention}...'
+        ))
+
+        # history() fetches 100 messages per request and waits out rate limits itself; only a chunk of
+        # submissions is held at once, and backfilled Wordles get no reactions so the import sends nothing per message
+        submissions = []
+        scanned = total_scanned = total_accepted = 0
+        last_message_id = None
+        last_report = time.monotonic()
+        try:
+            async for message in channel.history(limit = None, after = after, oldest_first = True):
+                scanned += 1
+                last_message_id = message.id
+                if not message.author.bot and self.looks_like_wordle(message.content):
+                    wordle_info = self.extract_wordle_info(message.content)
+                    if wordle_info is not None and self.verify_wordle_info(wordle_info[1], wordle_info[2]):
+                        submissions.append(self.submission(message, wordle_info))
+
+                if len(submissions) < BACKFILL_CHUNK_SIZE and scanned < BACKFILL_CHECKPOINT_INTERVAL:
+                    continue
+                accepted = await self.flush_backfill(ctx.guild.id, channel.id, submissions, last_message_id, scanned)
+                if accepted is None:
+                    break
+                total_scanned += scanned
+                total_accepted += accepted
+                submissions, scanned = [], 0
+
+                if time.monotonic() - last_report >= BACKFILL_PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await progress_message.edit(embed = discord.Embed(
+                        color = discord.Color.blue(),
+                        description = f'Importing Wordles from {channel.mention}... {total_scanned} messages scanned, {total_accepted} added'
+                    ))
+            else:
+                accepted = await self.flush_backfill(ctx.guild.id, channel.id, submissions, last_message_id, scanned) if scanned else 0
+                if accepted is not None:
+                    total_scanned += scanned
+                    total_accepted += accepted
+                    backfill_embed = discord.Embed(color = discord.Color.blue(), description = f'{total_scanned} messages scanned  |  {total_accepted} Wordles added')
+                    backfill_embed.set_author(name = f'{ctx.guild.name}\'s Wordle history has been imported', icon_url = ctx.guild.icon)
+                    await progress_message.edit(embed = backfill_embed)
+                    return
+
+        except discord.HTTPException as e:
+            print(f'Discord error in StoreWordle.run_backfill: {e}')
+
+        await progress_message.edit(embed = discord.Embed(
+            color = discord.Color.red(),
+            description = f'Wordle import stopped after {total_scanned} messages ({total_accepted} added). Run backfill again to resume.'
+        ))
+
+    async def flush_backfill(self, server_id: int, channel_id: int, submissions: list[dict], last_message_id: int, scanned: int) -> int | None:
+        # A crash between storing and checkpointing only means the chunk is scanned again and rejected as duplicates
+        accepted = 0
+        if submissions:
+            submitted = await run_db(submit_wordles, submissions)
+            if submitted is None:
+                return None
+            results, server_ids, stored_wordles = submitted
+            if any(results):
+                self.submissions_committed(server_ids, stored_wordles)
+            for submission, submission_accepted in zip(submissions, results):
+                if submission_accepted:
+                    stats_card_cache.bump(submission['user_id'])
+            accepted = sum(results)
+        if not await run_db(save_backfill_checkpoint, server_id, channel_id, last_message_id, scanned, accepted):
+            return None
+        return accepted
 
     @commands.command()
     async def manualreview(self, ctx: commands.Context) -> None:
@@ -110,14 +242,16 @@ class StoreWordle(commands.Cog):
         )
         await message.reply(embed = system_flag_embed)
 
+    @staticmethod
+    def looks_like_wordle(text: str) -> bool:
+        return len(text) >= MIN_WORDLE_LENGTH and text.startswith('Wordle')
+
     @staticmethod
     def extract_wordle_info(text: str) -> tuple | None:
-        regex_pattern = r'^Wordle\s+(\d{1,3}(?:,\d{3})*)\s+([1-6X])\/6\s*\r?\n\r?\n((?:[⬜⬛🟨🟩]{5}\r?\n){0,5}[⬜⬛🟨🟩]{5})(?:\r?\n.*)?$'
-        match = re.search(regex_pattern, text)
+        match = WORDLE_PATTERN.match(text)
         if match:
             wordle_id, wordle_score, wordle_grid = match.groups()
-            wordle_grid = wordle_grid.replace('⬜', 'W').replace('⬛', 'B').replace('🟨', 'Y').replace('🟩', 'G')
-            return wordle_id, wordle_score, wordle_grid
+            return wordle_id, wordle_score, wordle_grid.translate(GRID_TRANSLATION)
         return None
 
     @staticmethod
@@ -137,56 +271,47 @@ class StoreWordle(commands.Cog):
                 return False
         return True
 
-    async def store_wordle_info(self, message: discord.Message) -> None:
-        wordle_info = self.extract_wordle_info(message.content)
-        if wordle_info is None:
-            return
-
+    @staticmethod
+    def submission(message: discord.Message, wordle_info: tuple) -> dict:
         user = message.author
-        user_id = user.id
-        server_id = message.guild.id
         wordle_id, wordle_score, wordle_grid = wordle_info
         pst_time = message.created_at.astimezone(ZoneInfo('America/Los_Angeles'))
-        wordle_date = f'{pst_time.year}/{pst_time.month}/{pst_time.day}'
+        return {
+            'user_id': user.id,
+            'user_name': user.name,
+            'avatar': user.display_avatar.replace(format = 'png').url,
+            'server_id': message.guild.id,
+            'display_name': user.display_name,
+            # History returns a plain discord.User for authors who have left the guild
+            'is_member': isinstance(user, discord.Member),
+            'wordle_id': wordle_number(wordle_id),
+            'wordle_score': score_value(wordle_score),
+            'wordle_grid': wordle_grid,
+            'wordle_date': pst_time.date()
+        }
+
+    async def store_wordle_info(self, message: discord.Message, wordle_info: tuple) -> None:
+        start = time.perf_counter()
+        _, wordle_score, wordle_grid = wordle_info
 
         if not self.verify_wordle_info(wordle_score, wordle_grid):
+            SUBMISSIONS.inc(result = 'invalid')
             await message.add_reaction('❌')
             return
-        
-        session = get_session()
-        try:
-            existing_wordle = session.query(WordleData).filter(WordleData.user_id == user_id, WordleData.wordle_id == wordle_id).first()
-            if existing_wordle:
-                server_submission = session.query(WordleServerMembership).filter(
-                    WordleServerMembership.user_id == user_id,
-                    WordleServerMembership.server_id == server_id,
-                    WordleServerMembership.wordle_id == wordle_id).first()
-                
-                if server_submission:
-                    await message.add_reaction('❌')
-                else:
-                    if wordle_grid != existing_wordle.wordle_grid:
-                        await message.add_reaction('❌')
-                    else:
-                        add_wordle_server_membership(user_id, server_id, wordle_id)
-                        await message.add_reaction('✅')
-                        await self.check_for_suspicious_wordle(message, wordle_score, wordle_grid)
-            else:
-                add_user(user)
-                add_server_membership(user_id, server_id, user.display_name)
-                add_wordle(user_id, wordle_id, wordle_score, wordle_grid, wordle_date)
-                add_wordle_server_membership(user_id, server_id, wordle_id)
-
-                session.commit()
-                await message.add_reaction('✅')
-                await self.check_for_suspicious_wordle(message, wordle_score, wordle_grid)
-
-        except SQLAlchemyError as e:
-            print(f"Database error: {e}")
-            session.rollback()
-            
-        finally:
-            session.close()
+
+        accepted = await self.submission_queue.submit(self.submission(message, wordle_info))
+        SUBMISSION_LATENCY.observe(time.perf_counter() - start)
+        if accepted is None:
+            SUBMISSIONS.inc(result = 'error')
+            return
+        SUBMISSIONS.inc(result = 'accepted' if accepted else 'rejected')
+
+        if accepted:
+            stats_card_cache.bump(message.author.id)
+            await message.add_reaction('✅')
+            await self.check_for_suspicious_wordle(message, wordle_score, wordle_grid)
+        else:
+            await message.add_reaction('❌')
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(StoreWordle(bot))
@@ -10,3 +10,44 @@ DB_HOST = os.getenv('HOST')
 DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('PASSWORD')
 DB_NAME = os.getenv('DATABASE')
+# Overrides the MySQL settings above, e.g. sqlite:///bench.db for the benchmarks
+DATABASE_URL = os.getenv('DATABASE_URL')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+SUBMISSION_BATCH_SIZE = int(os.getenv('SUBMISSION_BATCH_SIZE', '100'))
+SUBMISSION_FLUSH_INTERVAL = float(os.getenv('SUBMISSION_FLUSH_INTERVAL_MS', '20')) / 1000
+AVATAR_CACHE_SIZE = int(os.getenv('AVATAR_CACHE_SIZE', '2000'))
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR', 'cache/avatars')
+# Most avatar files kept in AVATAR_CACHE_DIR; the least recently used are removed past this
+AVATAR_DISK_CACHE_SIZE = int(os.getenv('AVATAR_DISK_CACHE_SIZE', '20000'))
+AVATAR_FETCH_TIMEOUT = float(os.getenv('AVATAR_FETCH_TIMEOUT', '3'))
+AVATAR_FETCH_CONCURRENCY = int(os.getenv('AVATAR_FETCH_CONCURRENCY', '10'))
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', str(os.cpu_count() or 1)))
+RENDER_MAX_PENDING = int(os.getenv('RENDER_MAX_PENDING', '32'))
+RENDER_TIMEOUT = float(os.getenv('RENDER_TIMEOUT', '30'))
+LEADERBOARD_CACHE_BOARDS = int(os.getenv('LEADERBOARD_CACHE_BOARDS', '500'))
+LEADERBOARD_CACHE_PAGES = int(os.getenv('LEADERBOARD_CACHE_PAGES', '200'))
+RENDER_TILE_CACHE_SIZE = int(os.getenv('RENDER_TILE_CACHE_SIZE', '100'))
+LEADERBOARD_SNAPSHOTS = os.getenv('LEADERBOARD_SNAPSHOTS', '0') == '1'
+LEADERBOARD_SNAPSHOT_INTERVAL = int(os.getenv('LEADERBOARD_SNAPSHOT_INTERVAL', '300'))
+# 'sql' aggregates global leaderboards in MySQL, 'numpy' ranks them in memory (requires numpy)
+LEADERBOARD_ENGINE = os.getenv('LEADERBOARD_ENGINE', 'sql')
+# Sharding: AUTO_SHARD=1 runs an AutoShardedBot; SHARD_COUNT and SHARD_IDS (comma separated) pin its shards
+AUTO_SHARD = os.getenv('AUTO_SHARD', '0') == '1'
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+# discord.py can't place pinned shards without the total, and would only refuse once the bot is constructed
+if SHARD_IDS is not None and SHARD_COUNT is None:
+    raise ValueError('SHARD_IDS is set, so SHARD_COUNT must be set too')
+CLUSTER_PROCESSES = int(os.getenv('CLUSTER_PROCESSES', '1'))
+# Set per process by launcher.py; cluster 0 runs the once-per-deployment background jobs
+CLUSTER_ID = int(os.getenv('CLUSTER_ID', '0'))
+# Seconds a cached leaderboard stays valid; other processes' submissions can't invalidate it, so launcher.py defaults this on
+LEADERBOARD_CACHE_TTL = int(os.getenv('LEADERBOARD_CACHE_TTL', '0'))
+# Rendered !stats cards kept in memory; STATS_CACHE_DIR also keeps them on disk across restarts (empty disables)
+STATS_CACHE_SIZE = int(os.getenv('STATS_CACHE_SIZE', '1000'))
+STATS_CACHE_DIR = os.getenv('STATS_CACHE_DIR', '')
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', str(LEADERBOARD_CACHE_TTL)))
+SCORE_ENGINE_RELOAD_INTERVAL = int(os.getenv('SCORE_ENGINE_RELOAD_INTERVAL', '0'))
+# Serves Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 disables); cluster processes use METRICS_PORT + CLUSTER_ID
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
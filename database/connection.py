@@ -1,11 +1,38 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME
+from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, DB_POOL_SIZE, DATABASE_URL
+from util.metrics import SQL_LATENCY
 
-DATABASE_URL = f'mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
-engine = create_engine(DATABASE_URL, echo = False)
+DATABASE_URL = DATABASE_URL or f'mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+engine = create_engine(DATABASE_URL, echo = False, pool_size = DB_POOL_SIZE, pool_pre_ping = True)
 
 SessionFactory = sessionmaker(bind = engine)
 
+# Every blocking database call runs on these threads so the event loop never waits on MySQL.
+# One worker per pooled connection keeps threads from queueing on the connection pool.
+db_executor = ThreadPoolExecutor(max_workers = DB_POOL_SIZE, thread_name_prefix = 'db')
+
 def get_session() -> Session:
-    return SessionFactory()
\ No newline at end of file
+    return SessionFactory()
+
+def use_read_committed(session: Session) -> None:
+    # Must run before the session's first statement. Under InnoDB's default REPEATABLE READ an INSERT ... SELECT puts
+    # shared next-key locks on every row it reads, which stalls live submissions into the same range until it commits.
+    session.connection(execution_options = {'isolation_level': 'READ COMMITTED'})
+
+def timed_call(func: Callable[..., Any], *args, **kwargs) -> Any:
+    # Timed on the worker thread so the histogram measures the call itself, not the wait for a free thread
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        SQL_LATENCY.observe(time.perf_counter() - start, call_site = getattr(func, '__qualname__', type(func).__name__))
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(timed_call, func, *args, **kwargs))
@@ -0,0 +1,74 @@
+import argparse
+import importlib.util
+import re
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from database.connection import engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'sql' / 'migrations'
+MIGRATION_PATTERN = re.compile(r'^(\d{4})_\w+\.(sql|py)$')
+
+# Migrations are numbered files in sql/migrations. A .sql file is run statement by statement; a .py file must
+# define upgrade(engine) and handles its own batching and commits. MySQL commits every DDL statement on its own
+# and the schema_version row is written afterwards, so a failure can leave a migration partly applied but
+# unrecorded. Every migration must therefore be safe to rerun (IF NOT EXISTS, or information_schema checks).
+
+def ensure_version_table(connection: Connection) -> None:
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INT PRIMARY KEY, '
+        'name VARCHAR(255) NOT NULL, '
+        'applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)'
+    ))
+
+def applied_versions(connection: Connection) -> set[int]:
+    return {version for version, in connection.execute(text('SELECT version FROM schema_version')).all()}
+
+def available_migrations() -> list[tuple[int, Path]]:
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = MIGRATION_PATTERN.match(path.name)
+        if match:
+            migrations.append((int(match.group(1)), path))
+    return sorted(migrations)
+
+def split_statements(sql: str) -> list[str]:
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+def apply_migration(version: int, path: Path) -> None:
+    if path.suffix == '.sql':
+        with engine.begin() as connection:
+            for statement in split_statements(path.read_text()):
+                connection.execute(text(statement))
+    else:
+        spec = importlib.util.spec_from_file_location(f'migration_{version:04d}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text('INSERT INTO schema_version (version, name) VALUES (:version, :name)'), {'version': version, 'name': path.name})
+
+def migrate(target: int | None = None, dry_run: bool = False) -> list[int]:
+    with engine.begin() as connection:
+        ensure_version_table(connection)
+        applied = applied_versions(connection)
+
+    pending = [(version, path) for version, path in available_migrations() if version not in applied and (target is None or version <= target)]
+    for version, path in pending:
+        print(f'{"PENDING" if dry_run else "APPLYING"} {path.name}')
+        if not dry_run:
+            apply_migration(version, path)
+    return [version for version, _ in pending]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Apply pending WordleBot schema migrations')
+    parser.add_argument('--target', type = int, default = None, help = 'Highest migration version to apply')
+    parser.add_argument('--dry-run', action = 'store_true', help = 'List pending migrations without applying them')
+    args = parser.parse_args()
+
+    versions = migrate(args.target, args.dry_run)
+    if not versions:
+        print('SCHEMA IS UP TO DATE')
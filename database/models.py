@@ -1,8 +1,12 @@
-from sqlalchemy import Column, BigInteger, String, Date, ForeignKey, ForeignKeyConstraint
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, Date, DateTime, Numeric, ForeignKey, ForeignKeyConstraint, Index
+from sqlalchemy.dialects.mysql import TINYINT
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# A failed (X/6) Wordle is stored as this score, the value leaderboards average it as
+FAILED_SCORE = 10
+
 class User(Base):
     __tablename__ = 'user_data'
     user_id = Column(BigInteger, primary_key = True)
@@ -21,19 +25,27 @@ class ServerMembership(Base):
     server_id = Column(BigInteger, ForeignKey('server_data.server_id'), primary_key = True)
     display_name = Column(String(32), nullable = False)
 
+    __table_args__ = (
+        Index('idx_server_membership_server', 'server_id', 'user_id', 'display_name'),
+    )
+
 class WordleData(Base):
     __tablename__ = 'wordle_data'
     user_id = Column(BigInteger, ForeignKey('user_data.user_id'), primary_key = True)
-    wordle_id = Column(String(100), primary_key = True)
-    wordle_score = Column(String(1), nullable = False)
+    wordle_id = Column(Integer, primary_key = True, autoincrement = False)
+    wordle_score = Column(SmallInteger().with_variant(TINYINT(), 'mysql'), nullable = False)
     wordle_grid = Column(String(35), nullable = False)
     wordle_date = Column(Date, nullable = False)
 
+    __table_args__ = (
+        Index('idx_wordle_data_date_user_score', 'wordle_date', 'user_id', 'wordle_score'),
+    )
+
 class WordleServerMembership(Base):
     __tablename__ = 'wordle_server_membership'
     user_id = Column(BigInteger, ForeignKey('user_data.user_id'), primary_key = True)
     server_id = Column(BigInteger, ForeignKey('server_data.server_id'), primary_key = True)
-    wordle_id = Column(String(100), primary_key = True)
+    wordle_id = Column(Integer, primary_key = True, autoincrement = False)
 
     __table_args__= (
         ForeignKeyConstraint(
@@ -41,3 +53,48 @@ class WordleServerMembership(Base):
             ['wordle_data.user_id', 'wordle_data.wordle_id']
         ),
     )
+
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+    user_id = Column(BigInteger, ForeignKey('user_data.user_id'), primary_key = True)
+    score_1 = Column(Integer, nullable = False, default = 0)
+    score_2 = Column(Integer, nullable = False, default = 0)
+    score_3 = Column(Integer, nullable = False, default = 0)
+    score_4 = Column(Integer, nullable = False, default = 0)
+    score_5 = Column(Integer, nullable = False, default = 0)
+    score_6 = Column(Integer, nullable = False, default = 0)
+    score_x = Column(Integer, nullable = False, default = 0)
+    total_games = Column(Integer, nullable = False, default = 0)
+    score_sum = Column(Integer, nullable = False, default = 0)
+    current_streak = Column(Integer, nullable = False, default = 0)
+    longest_streak = Column(Integer, nullable = False, default = 0)
+    last_wordle_number = Column(Integer, nullable = True)
+
+class LeaderboardSnapshot(Base):
+    __tablename__ = 'leaderboard_snapshot'
+    # scope_id is a server_id, or 0 for the global leaderboard
+    scope_id = Column(BigInteger, primary_key = True, autoincrement = False)
+    period = Column(String(16), primary_key = True)
+    user_id = Column(BigInteger, primary_key = True, autoincrement = False)
+    rank = Column(Integer, nullable = False)
+    score = Column(Numeric(6, 4), nullable = False)
+    games_played = Column(Integer, nullable = False)
+
+    __table_args__ = (
+        Index('idx_leaderboard_snapshot_score', 'scope_id', 'period', 'score', 'user_id'),
+    )
+
+class LeaderboardSnapshotMeta(Base):
+    __tablename__ = 'leaderboard_snapshot_meta'
+    period = Column(String(16), primary_key = True)
+    refreshed_at = Column(DateTime, nullable = False)
+
+class BackfillCheckpoint(Base):
+    __tablename__ = 'backfill_checkpoint'
+    server_id = Column(BigInteger, ForeignKey('server_data.server_id'), primary_key = True, autoincrement = False)
+    channel_id = Column(BigInteger, primary_key = True, autoincrement = False)
+    # The newest message scanned so far; a backfill resumes with the messages after it
+    last_message_id = Column(BigInteger, nullable = False)
+    messages_scanned = Column(Integer, nullable = False, default = 0)
+    wordles_accepted = Column(Integer, nullable = False, default = 0)
+    updated_at = Column(DateTime, nullable = False)
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+import aiohttp
+import config
+
+DISCORD_API = 'https://discord.com/api/v10'
+RESTART_DELAY = 5
+
+async def fetch_recommended_shard_count() -> int:
+    headers = {'Authorization': f'Bot {config.DISCORD_BOT_TOKEN}'}
+    async with aiohttp.ClientSession(headers = headers) as session:
+        async with session.get(f'{DISCORD_API}/gateway/bot') as response:
+            response.raise_for_status()
+            return (await response.json())['shards']
+
+def shard_ranges(shard_count: int, processes: int) -> list[list[int]]:
+    # Contiguous, as even as possible, and never an empty process
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+def run_cluster(shard_ids: list[int], shard_count: int) -> None:
+    import bot
+    asyncio.run(bot.main(shard_ids, shard_count))
+
+def start_cluster(context, cluster_id: int, shard_ids: list[int], shard_count: int) -> multiprocessing.Process:
+    # Spawned children read their config from the environment at import, which is how they learn their cluster id
+    os.environ['CLUSTER_ID'] = str(cluster_id)
+    process = context.Process(target = run_cluster, args = (shard_ids, shard_count), name = f'cluster-{cluster_id}')
+    process.start()
+    print(f'CLUSTER {cluster_id} STARTED WITH SHARDS {shard_ids} (PID {process.pid})')
+    return process
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = 'Run WordleBot as several processes, each owning a range of shards.')
+    parser.add_argument('--processes', type = int, default = config.CLUSTER_PROCESSES, help = 'number of bot processes')
+    parser.add_argument('--shard-count', type = int, default = config.SHARD_COUNT, help = 'total shards (default: Discord\'s recommendation)')
+    parser.add_argument('--shard-ids', type = str, default = None, help = 'comma separated shards to run here when other hosts run the rest (default: all)')
+    args = parser.parse_args()
+
+    shard_count = args.shard_count or asyncio.run(fetch_recommended_shard_count())
+    shard_ids = [int(shard_id) for shard_id in args.shard_ids.split(',')] if args.shard_ids else list(range(shard_count))
+    ranges = [[shard_ids[i] for i in shard_range] for shard_range in shard_ranges(len(shard_ids), args.processes)]
+
+    # Each process only hears about its own guilds' submissions, so cached boards have to expire on their own
+    os.environ.setdefault('LEADERBOARD_CACHE_TTL', '60')
+    os.environ.setdefault('SCORE_ENGINE_RELOAD_INTERVAL', '600')
+
+    context = multiprocessing.get_context('spawn')
+    clusters = {cluster_id: start_cluster(context, cluster_id, shard_range, shard_count) for cluster_id, shard_range in enumerate(ranges)}
+    try:
+        while True:
+            time.sleep(RESTART_DELAY)
+            for cluster_id, process in clusters.items():
+                if not process.is_alive():
+                    print(f'CLUSTER {cluster_id} EXITED WITH CODE {process.exitcode}, RESTARTING')
+                    clusters[cluster_id] = start_cluster(context, cluster_id, ranges[cluster_id], shard_count)
+    except KeyboardInterrupt:
+        for process in clusters.values():
+            process.terminate()
+        for process in clusters.values():
+            process.join()
+
+if __name__ == '__main__':
+    main()
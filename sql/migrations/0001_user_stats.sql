@@ -0,0 +1,31 @@
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id BIGINT PRIMARY KEY,
+    score_1 INT NOT NULL DEFAULT 0,
+    score_2 INT NOT NULL DEFAULT 0,
+    score_3 INT NOT NULL DEFAULT 0,
+    score_4 INT NOT NULL DEFAULT 0,
+    score_5 INT NOT NULL DEFAULT 0,
+    score_6 INT NOT NULL DEFAULT 0,
+    score_x INT NOT NULL DEFAULT 0,
+    total_games INT NOT NULL DEFAULT 0,
+    score_sum INT NOT NULL DEFAULT 0,
+    FOREIGN KEY(user_id) REFERENCES user_data(user_id)
+);
+
+-- Existing players' totals, so !stats is right from the moment this is applied. wordle_score is still
+-- VARCHAR(1) here, and X counts as 10 towards score_sum as it does in the leaderboards. IGNORE keeps a rerun
+-- from failing on users a previous attempt already filled in.
+INSERT IGNORE INTO user_stats (user_id, score_1, score_2, score_3, score_4, score_5, score_6, score_x, total_games, score_sum)
+SELECT
+    user_id,
+    SUM(wordle_score = '1'),
+    SUM(wordle_score = '2'),
+    SUM(wordle_score = '3'),
+    SUM(wordle_score = '4'),
+    SUM(wordle_score = '5'),
+    SUM(wordle_score = '6'),
+    SUM(wordle_score = 'X'),
+    COUNT(*),
+    SUM(IF(wordle_score = 'X', 10, CAST(wordle_score AS UNSIGNED)))
+FROM wordle_data
+GROUP BY user_id;
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# Adds streak columns to user_stats and fills them from each user's existing Wordles, a batch of users at a time.
+# wordle_id is still a comma-formatted VARCHAR at this version, so the numbers are parsed and sorted here.
+
+USER_BATCH_SIZE = 1000
+
+def column_exists(connection: Connection, table: str, column: str) -> bool:
+    return connection.execute(text(
+        'SELECT COUNT(*) FROM information_schema.COLUMNS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column'
+    ), {'table': table, 'column': column}).scalar() > 0
+
+def streaks(numbers: list[int]) -> tuple[int, int, int]:
+    # numbers sorted ascending; returns (current streak, longest streak, last Wordle number)
+    longest_streak = current_streak = 1
+    for previous, number in zip(numbers, numbers[1:]):
+        current_streak = current_streak + 1 if number - previous == 1 else 1
+        longest_streak = max(longest_streak, current_streak)
+    return current_streak, longest_streak, numbers[-1]
+
+def upgrade(engine: Engine) -> None:
+    with engine.begin() as connection:
+        if not column_exists(connection, 'user_stats', 'current_streak'):
+            connection.execute(text(
+                'ALTER TABLE user_stats '
+                'ADD COLUMN current_streak INT NOT NULL DEFAULT 0, '
+                'ADD COLUMN longest_streak INT NOT NULL DEFAULT 0, '
+                'ADD COLUMN last_wordle_number INT'
+            ))
+
+    last_user_id = -1
+    while True:
+        with engine.begin() as connection:
+            user_ids = [user_id for user_id, in connection.execute(
+                text('SELECT user_id FROM user_stats WHERE user_id > :last_user_id ORDER BY user_id LIMIT :batch_size'),
+                {'last_user_id': last_user_id, 'batch_size': USER_BATCH_SIZE}
+            ).all()]
+            if not user_ids:
+                return
+
+            numbers_by_user = {}
+            for user_id, wordle_id in connection.execute(
+                text('SELECT user_id, wordle_id FROM wordle_data WHERE user_id BETWEEN :first_user_id AND :last_user_id'),
+                {'first_user_id': user_ids[0], 'last_user_id': user_ids[-1]}
+            ).all():
+                numbers_by_user.setdefault(user_id, []).append(int(wordle_id.replace(',', '')))
+
+            streak_rows = []
+            for user_id, numbers in numbers_by_user.items():
+                current_streak, longest_streak, last_number = streaks(sorted(numbers))
+                streak_rows.append({'user_id': user_id, 'current_streak': current_streak, 'longest_streak': longest_streak, 'last_wordle_number': last_number})
+            if streak_rows:
+                connection.execute(text(
+                    'UPDATE user_stats SET current_streak = :current_streak, longest_streak = :longest_streak, '
+                    'last_wordle_number = :last_wordle_number WHERE user_id = :user_id'
+                ), streak_rows)
+        last_user_id = user_ids[-1]
+        print(f'  backfilled streaks up to user {last_user_id}')
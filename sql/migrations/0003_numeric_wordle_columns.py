@@ -0,0 +1,92 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# Moves wordle_id from comma-formatted VARCHAR(100) to INT and wordle_score from VARCHAR(1) to TINYINT.
+# X is stored as 10, the value the leaderboards already averaged it as. Rows are rewritten in batches of
+# users so no single transaction holds locks over the whole table.
+# MySQL commits each ALTER on its own, so every step checks information_schema for whether it already ran
+# and a failed upgrade can simply be rerun.
+
+USER_BATCH_SIZE = 1000
+
+def column_type(connection: Connection, table: str, column: str) -> str | None:
+    return connection.execute(text(
+        'SELECT DATA_TYPE FROM information_schema.COLUMNS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column'
+    ), {'table': table, 'column': column}).scalar()
+
+def wordle_data_foreign_keys(connection: Connection) -> list[str]:
+    return [name for name, in connection.execute(text(
+        "SELECT DISTINCT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'wordle_server_membership' AND REFERENCED_TABLE_NAME = 'wordle_data'"
+    )).all()]
+
+def backfill(engine: Engine, update_sql: str) -> None:
+    last_user_id = -1
+    while True:
+        with engine.begin() as connection:
+            user_ids = [user_id for user_id, in connection.execute(
+                text('SELECT user_id FROM user_data WHERE user_id > :last_user_id ORDER BY user_id LIMIT :batch_size'),
+                {'last_user_id': last_user_id, 'batch_size': USER_BATCH_SIZE}
+            ).all()]
+            if not user_ids:
+                return
+            connection.execute(text(update_sql), {'first_user_id': user_ids[0], 'last_user_id': user_ids[-1]})
+        last_user_id = user_ids[-1]
+        print(f'  backfilled users up to {last_user_id}')
+
+def upgrade(engine: Engine) -> None:
+    # A table is done once its wordle_id is the INT column; until then the new columns are added if missing
+    with engine.begin() as connection:
+        wordle_data_done = column_type(connection, 'wordle_data', 'wordle_id') == 'int'
+        server_wordles_done = column_type(connection, 'wordle_server_membership', 'wordle_id') == 'int'
+        if not wordle_data_done:
+            if column_type(connection, 'wordle_data', 'wordle_number') is None:
+                connection.execute(text('ALTER TABLE wordle_data ADD COLUMN wordle_number INT NULL'))
+            if column_type(connection, 'wordle_data', 'score') is None:
+                connection.execute(text('ALTER TABLE wordle_data ADD COLUMN score TINYINT NULL'))
+        if not server_wordles_done and column_type(connection, 'wordle_server_membership', 'wordle_number') is None:
+            connection.execute(text('ALTER TABLE wordle_server_membership ADD COLUMN wordle_number INT NULL'))
+
+    if not wordle_data_done:
+        backfill(engine, (
+            "UPDATE wordle_data SET "
+            "wordle_number = CAST(REPLACE(wordle_id, ',', '') AS UNSIGNED), "
+            "score = IF(wordle_score = 'X', 10, CAST(wordle_score AS UNSIGNED)) "
+            "WHERE user_id BETWEEN :first_user_id AND :last_user_id AND wordle_number IS NULL"
+        ))
+    if not server_wordles_done:
+        backfill(engine, (
+            "UPDATE wordle_server_membership SET "
+            "wordle_number = CAST(REPLACE(wordle_id, ',', '') AS UNSIGNED) "
+            "WHERE user_id BETWEEN :first_user_id AND :last_user_id AND wordle_number IS NULL"
+        ))
+
+    with engine.begin() as connection:
+        if not (wordle_data_done and server_wordles_done):
+            for name in wordle_data_foreign_keys(connection):
+                connection.execute(text(f'ALTER TABLE wordle_server_membership DROP FOREIGN KEY `{name}`'))
+
+        if not server_wordles_done:
+            connection.execute(text(
+                'ALTER TABLE wordle_server_membership '
+                'DROP PRIMARY KEY, '
+                'DROP COLUMN wordle_id, '
+                'CHANGE wordle_number wordle_id INT NOT NULL, '
+                'ADD PRIMARY KEY (user_id, server_id, wordle_id)'
+            ))
+        if not wordle_data_done:
+            connection.execute(text(
+                'ALTER TABLE wordle_data '
+                'DROP PRIMARY KEY, '
+                'DROP COLUMN wordle_id, '
+                'DROP COLUMN wordle_score, '
+                'CHANGE wordle_number wordle_id INT NOT NULL, '
+                'CHANGE score wordle_score TINYINT NOT NULL, '
+                'ADD PRIMARY KEY (user_id, wordle_id)'
+            ))
+        if not wordle_data_foreign_keys(connection):
+            connection.execute(text(
+                'ALTER TABLE wordle_server_membership '
+                'ADD FOREIGN KEY (user_id, wordle_id) REFERENCES wordle_data(user_id, wordle_id)'
+            ))
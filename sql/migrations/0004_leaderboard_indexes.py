@@ -0,0 +1,24 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# MySQL has no CREATE INDEX IF NOT EXISTS, so each index is checked in information_schema first
+# and a partly applied upgrade can be rerun.
+
+INDEXES = {
+    # Period leaderboards filter on a wordle_date range and aggregate user_id/wordle_score, so this index covers them
+    'idx_wordle_data_date_user_score': ('wordle_data', '(wordle_date, user_id, wordle_score)'),
+    # Server leaderboards look members up by server_id; the primary key leads with user_id
+    'idx_server_membership_server': ('server_membership', '(server_id, user_id, display_name)')
+}
+
+def index_exists(connection: Connection, table: str, index: str) -> bool:
+    return connection.execute(text(
+        'SELECT COUNT(*) FROM information_schema.STATISTICS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :index'
+    ), {'table': table, 'index': index}).scalar() > 0
+
+def upgrade(engine: Engine) -> None:
+    for index, (table, columns) in INDEXES.items():
+        with engine.begin() as connection:
+            if not index_exists(connection, table, index):
+                connection.execute(text(f'CREATE INDEX {index} ON {table} {columns}'))
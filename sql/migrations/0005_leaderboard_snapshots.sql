@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS leaderboard_snapshot (
+    scope_id BIGINT NOT NULL,
+    period VARCHAR(16) NOT NULL,
+    user_id BIGINT NOT NULL,
+    `rank` INT NOT NULL,
+    score DECIMAL(6, 4) NOT NULL,
+    games_played INT NOT NULL,
+    PRIMARY KEY(scope_id, period, user_id),
+    INDEX idx_leaderboard_snapshot_score (scope_id, period, score, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS leaderboard_snapshot_meta (
+    period VARCHAR(16) PRIMARY KEY,
+    refreshed_at DATETIME NOT NULL
+);
@@ -0,0 +1,11 @@
+-- Progress of !backfill per channel, so an interrupted import resumes after the last message it scanned
+CREATE TABLE IF NOT EXISTS backfill_checkpoint (
+    server_id BIGINT NOT NULL,
+    channel_id BIGINT NOT NULL,
+    last_message_id BIGINT NOT NULL,
+    messages_scanned INT NOT NULL DEFAULT 0,
+    wordles_accepted INT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY(server_id, channel_id),
+    FOREIGN KEY(server_id) REFERENCES server_data(server_id)
+);
@@ -23,8 +23,8 @@ CREATE TABLE server_membership (
 
 CREATE TABLE wordle_data (
     user_id BIGINT NOT NULL,
-    wordle_id VARCHAR(100) NOT NULL,
-    wordle_score VARCHAR(1) NOT NULL,
+    wordle_id INT NOT NULL,
+    wordle_score TINYINT NOT NULL,
     wordle_grid VARCHAR(35) NOT NULL,
     wordle_date DATE NOT NULL,
     PRIMARY KEY(user_id, wordle_id),
@@ -34,9 +34,70 @@ CREATE TABLE wordle_data (
 CREATE TABLE wordle_server_membership (
     user_id BIGINT NOT NULL,
     server_id BIGINT NOT NULL,
-    wordle_id VARCHAR(100) NOT NULL,
+    wordle_id INT NOT NULL,
     PRIMARY KEY(user_id, server_id, wordle_id),
     FOREIGN KEY(user_id) REFERENCES user_data(user_id),
     FOREIGN KEY(server_id) REFERENCES server_data(server_id),
     FOREIGN KEY(user_id, wordle_id) REFERENCES wordle_data(user_id, wordle_id)
 );
+
+CREATE TABLE user_stats (
+    user_id BIGINT PRIMARY KEY,
+    score_1 INT NOT NULL DEFAULT 0,
+    score_2 INT NOT NULL DEFAULT 0,
+    score_3 INT NOT NULL DEFAULT 0,
+    score_4 INT NOT NULL DEFAULT 0,
+    score_5 INT NOT NULL DEFAULT 0,
+    score_6 INT NOT NULL DEFAULT 0,
+    score_x INT NOT NULL DEFAULT 0,
+    total_games INT NOT NULL DEFAULT 0,
+    score_sum INT NOT NULL DEFAULT 0,
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    last_wordle_number INT,
+    FOREIGN KEY(user_id) REFERENCES user_data(user_id)
+);
+
+CREATE INDEX idx_wordle_data_date_user_score ON wordle_data (wordle_date, user_id, wordle_score);
+CREATE INDEX idx_server_membership_server ON server_membership (server_id, user_id, display_name);
+
+CREATE TABLE leaderboard_snapshot (
+    scope_id BIGINT NOT NULL,
+    period VARCHAR(16) NOT NULL,
+    user_id BIGINT NOT NULL,
+    `rank` INT NOT NULL,
+    score DECIMAL(6, 4) NOT NULL,
+    games_played INT NOT NULL,
+    PRIMARY KEY(scope_id, period, user_id),
+    INDEX idx_leaderboard_snapshot_score (scope_id, period, score, user_id)
+);
+
+CREATE TABLE leaderboard_snapshot_meta (
+    period VARCHAR(16) PRIMARY KEY,
+    refreshed_at DATETIME NOT NULL
+);
+
+CREATE TABLE backfill_checkpoint (
+    server_id BIGINT NOT NULL,
+    channel_id BIGINT NOT NULL,
+    last_message_id BIGINT NOT NULL,
+    messages_scanned INT NOT NULL DEFAULT 0,
+    wordles_accepted INT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY(server_id, channel_id),
+    FOREIGN KEY(server_id) REFERENCES server_data(server_id)
+);
+
+CREATE TABLE schema_version (
+    version INT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO schema_version (version, name) VALUES
+    (1, '0001_user_stats.sql'),
+    (2, '0002_user_streaks.py'),
+    (3, '0003_numeric_wordle_columns.py'),
+    (4, '0004_leaderboard_indexes.py'),
+    (5, '0005_leaderboard_snapshots.sql'),
+    (6, '0006_backfill_checkpoint.sql');
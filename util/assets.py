@@ -0,0 +1,44 @@
+import os
+import time
+from PIL import Image, ImageFont
+
+FONT_PATHS = {
+    'bold': 'assets/whitneybold.otf',
+    'medium': 'assets/whitneymedium.otf'
+}
+FONT_SIZES = (30, 60)
+DEFAULT_AVATAR_PATH = 'assets/default_avatar.png'
+# Avatars are masked to this size in the bot process and unpacked at it in the render workers
+AVATAR_SIZE = 100
+
+class AssetRegistry:
+    # Fonts are only needed where images are drawn, so load() runs as the render pool's worker initializer.
+    # The bot process itself only ever needs the default avatar, which is decoded on its own when first asked for.
+    def __init__(self) -> None:
+        self._fonts: dict[tuple[str, int], ImageFont.FreeTypeFont] = {}
+        self._default_avatar: Image.Image | None = None
+        self.load_time: float | None = None
+
+    def load(self) -> None:
+        if self.load_time is not None:
+            return
+
+        start = time.perf_counter()
+        for name, path in FONT_PATHS.items():
+            for size in FONT_SIZES:
+                self._fonts[(name, size)] = ImageFont.truetype(path, size)
+        self.default_avatar()
+        self.load_time = time.perf_counter() - start
+        print(f'ASSETS LOADED IN {self.load_time * 1000:.1f}ms (PID {os.getpid()})')
+
+    def font(self, name: str, size: int) -> ImageFont.FreeTypeFont:
+        self.load()
+        return self._fonts[(name, size)]
+
+    def default_avatar(self) -> Image.Image:
+        if self._default_avatar is None:
+            with Image.open(DEFAULT_AVATAR_PATH) as default_avatar:
+                self._default_avatar = default_avatar.convert('RGBA')
+        return self._default_avatar
+
+assets = AssetRegistry()
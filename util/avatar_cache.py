@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import os
+import time
+from io import BytesIO
+from pathlib import Path
+import aiohttp
+from PIL import Image, ImageChops, ImageDraw
+from util.lru import LRUCache
+from util.files import atomic_write
+from util.assets import assets, AVATAR_SIZE
+from util.metrics import AVATAR_FETCH_LATENCY, CACHE_REQUESTS
+
+class AvatarCache:
+    def __init__(self, max_entries: int, cache_dir: str, fetch_timeout: float, max_concurrent_fetches: int, max_disk_entries: int) -> None:
+        self._memory = LRUCache(max_entries)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents = True, exist_ok = True)
+        self.max_disk_entries = max_disk_entries
+        self._disk_writes = 0
+        self._pruned = False
+        self.fetch_timeout = fetch_timeout
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self._mask = Image.new('L', (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(self._mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill = 255)
+        self._default_avatar: Image.Image | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._fetch_limit: asyncio.Semaphore | None = None
+
+    async def start(self) -> None:
+        if not self._pruned:
+            self._pruned = True
+            await asyncio.to_thread(self.prune_disk)
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout = aiohttp.ClientTimeout(total = self.fetch_timeout))
+            self._fetch_limit = asyncio.Semaphore(self.max_concurrent_fetches)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _disk_path(self, url: str) -> Path:
+        return self.cache_dir / f'{hashlib.sha1(url.encode()).hexdigest()}.png'
+
+    def prune_disk(self) -> int:
+        # Disk hits touch a file's mtime, so removing the oldest files evicts the least recently used avatars
+        try:
+            files = [(entry.stat().st_mtime, entry.path) for entry in os.scandir(self.cache_dir) if entry.is_file()]
+        except OSError as e:
+            print(f'Could not scan avatar cache directory {self.cache_dir}: {e}')
+            return 0
+
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return 0
+        removed = 0
+        for _, path in sorted(files)[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def mask_avatar(self, avatar: Image.Image) -> Image.Image:
+        avatar = avatar.convert('RGBA').resize((AVATAR_SIZE, AVATAR_SIZE))
+        avatar.putalpha(ImageChops.multiply(avatar.getchannel('A'), self._mask))
+        return avatar
+
+    def default_avatar(self) -> Image.Image:
+        if self._default_avatar is None:
+            self._default_avatar = self.mask_avatar(assets.default_avatar())
+        return self._default_avatar
+
+    def _read_disk(self, urls: list[str]) -> dict[str, Image.Image]:
+        # Runs in a worker thread, so decoding a page's cached avatars doesn't hold up the event loop
+        loaded = {}
+        for url in urls:
+            disk_path = self._disk_path(url)
+            try:
+                with Image.open(disk_path) as cached:
+                    loaded[url] = cached.convert('RGBA')
+                os.utime(disk_path)
+            except (OSError, ValueError):
+                CACHE_REQUESTS.inc(cache = 'avatar_disk', result = 'miss')
+                continue
+            CACHE_REQUESTS.inc(cache = 'avatar_disk', result = 'hit')
+        return loaded
+
+    def _write_disk(self, fetched: dict[str, bytes]) -> tuple[dict[str, Image.Image], int]:
+        # Runs in a worker thread; returns the masked avatars and how many of them reached the disk
+        avatars = {}
+        written = 0
+        for url, data in fetched.items():
+            try:
+                avatar = self.mask_avatar(Image.open(BytesIO(data)))
+            except Exception:
+                continue
+            avatars[url] = avatar
+
+            disk_path = self._disk_path(url)
+            png = BytesIO()
+            avatar.save(png, format = 'PNG')
+            try:
+                atomic_write(disk_path, png.getvalue())
+                written += 1
+            except OSError as e:
+                print(f'Could not write avatar cache file {disk_path}: {e}')
+        return avatars, written
+
+    async def get_cached(self, urls: list[str]) -> dict[str, Image.Image]:
+        found = {}
+        misses = []
+        for url in dict.fromkeys(urls):
+            avatar = self._memory.get(url)
+            CACHE_REQUESTS.inc(cache = 'avatar_memory', result = 'miss' if avatar is None else 'hit')
+            if avatar is None:
+                misses.append(url)
+            else:
+                found[url] = avatar
+        if misses:
+            loaded = await asyncio.to_thread(self._read_disk, misses)
+            for url, avatar in loaded.items():
+                self._memory.put(url, avatar)
+            found.update(loaded)
+        return found
+
+    async def store(self, fetched: dict[str, bytes]) -> dict[str, Image.Image]:
+        if not fetched:
+            return {}
+        avatars, written = await asyncio.to_thread(self._write_disk, fetched)
+        for url, avatar in avatars.items():
+            self._memory.put(url, avatar)
+
+        # Pruned every tenth of the cap in new files, so the directory overshoots by at most that much
+        self._disk_writes += written
+        if self._disk_writes >= max(1, self.max_disk_entries // 10):
+            self._disk_writes = 0
+            await asyncio.to_thread(self.prune_disk)
+        return avatars
+
+    async def fetch(self, url: str) -> bytes | None:
+        await self.start()
+        async with self._fetch_limit:
+            start = time.perf_counter()
+            result = 'error'
+            try:
+                async with self._session.get(url) as response:
+                    if response.status != 200:
+                        return None
+                    data = await response.read()
+                    result = 'ok'
+                    return data
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return None
+            finally:
+                AVATAR_FETCH_LATENCY.observe(time.perf_counter() - start, result = result)
+
+    async def _fetch_all(self, urls: list[str]) -> dict[str, bytes]:
+        urls = list(dict.fromkeys(urls))
+        fetched = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return {url: data for url, data in zip(urls, fetched) if data is not None}
+
+    async def get_many(self, avatar_urls: list[tuple[str | None, str | None]]) -> list[Image.Image]:
+        # Each entry is (stored URL, fallback URL); every fetch for the page is in flight at once
+        # and decoding only starts once all of them have finished.
+        cached = await self.get_cached([url for url, _ in avatar_urls if url])
+        avatars = [cached.get(url) if url else None for url, _ in avatar_urls]
+        primary = await self.store(await self._fetch_all([url for (url, _), avatar in zip(avatar_urls, avatars) if avatar is None and url]))
+        avatars = [avatar if avatar is not None else primary.get(url) for (url, _), avatar in zip(avatar_urls, avatars)]
+
+        cached = await self.get_cached([fallback_url for (_, fallback_url), avatar in zip(avatar_urls, avatars) if avatar is None and fallback_url])
+        avatars = [avatar if avatar is not None else cached.get(fallback_url) for (_, fallback_url), avatar in zip(avatar_urls, avatars)]
+        fallback = await self.store(await self._fetch_all([fallback_url for (_, fallback_url), avatar in zip(avatar_urls, avatars) if avatar is None and fallback_url]))
+        avatars = [avatar if avatar is not None else fallback.get(fallback_url) for (_, fallback_url), avatar in zip(avatar_urls, avatars)]
+
+        return [avatar if avatar is not None else self.default_avatar() for avatar in avatars]
@@ -0,0 +1,13 @@
+import os
+from pathlib import Path
+
+def atomic_write(path: Path, data: bytes) -> None:
+    # Written to a temporary file and renamed into place so other bot processes sharing the directory never read half a file.
+    # Raises OSError like any other write.
+    temp_path = path.with_name(f'{path.stem}.{os.getpid()}.tmp')
+    try:
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    except OSError:
+        temp_path.unlink(missing_ok = True)
+        raise
@@ -0,0 +1,73 @@
+from sqlalchemy.exc import SQLAlchemyError
+from database.connection import get_session, run_db
+from database.models import ServerData
+
+DEFAULT_PREFIX = '!'
+
+def shard_for_guild(server_id: int, shard_count: int) -> int:
+    # Discord's guild to shard mapping
+    return (server_id >> 22) % shard_count
+
+class GuildConfigCache:
+    def __init__(self) -> None:
+        self._configs: dict[int, dict] = {}
+
+    def load(self, shard_ids: list[int] | None = None, shard_count: int | None = None) -> None:
+        # A process running only some shards only ever sees those shards' guilds, so it skips the rest
+        session = get_session()
+        try:
+            servers = session.query(ServerData.server_id, ServerData.prefix, ServerData.wordle_channel_id).all()
+            self._configs = {
+                server_id: {'prefix': prefix or DEFAULT_PREFIX, 'wordle_channel_id': wordle_channel_id}
+                for server_id, prefix, wordle_channel_id in servers
+                if shard_ids is None or not shard_count or shard_for_guild(server_id, shard_count) in shard_ids
+            }
+            print(f'GUILD CONFIG CACHE LOADED ({len(self._configs)} servers)')
+
+        except SQLAlchemyError as e:
+            print(f'Database error in GuildConfigCache.load: {e}')
+
+        finally:
+            session.close()
+
+    @staticmethod
+    def fetch(server_id: int) -> dict | None:
+        session = get_session()
+        try:
+            server = session.query(ServerData).filter(ServerData.server_id == server_id).first()
+            return {
+                'prefix': server.prefix if server and server.prefix else DEFAULT_PREFIX,
+                'wordle_channel_id': server.wordle_channel_id if server else None
+            }
+        except SQLAlchemyError as e:
+            print(f'Database error in GuildConfigCache.fetch: {e}')
+            return None
+        finally:
+            session.close()
+
+    async def _get(self, server_id: int) -> dict:
+        config = self._configs.get(server_id)
+        if config is not None:
+            return config
+
+        config = await run_db(self.fetch, server_id)
+        if config is None:
+            return {'prefix': DEFAULT_PREFIX, 'wordle_channel_id': None}
+        return self._configs.setdefault(server_id, config)
+
+    async def get_prefix(self, server_id: int) -> str:
+        return (await self._get(server_id))['prefix']
+
+    async def get_wordle_channel_id(self, server_id: int) -> int | None:
+        return (await self._get(server_id))['wordle_channel_id']
+
+    def add_server(self, server_id: int) -> None:
+        self._configs.setdefault(server_id, {'prefix': DEFAULT_PREFIX, 'wordle_channel_id': None})
+
+    async def set_prefix(self, server_id: int, prefix: str) -> None:
+        (await self._get(server_id))['prefix'] = prefix
+
+    async def set_wordle_channel_id(self, server_id: int, channel_id: int | None) -> None:
+        (await self._get(server_id))['wordle_channel_id'] = channel_id
+
+guild_configs = GuildConfigCache()
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func, select, delete, literal
+from sqlalchemy.dialects.mysql import insert
+from database.connection import get_session, use_read_committed
+from database.models import WordleData, ServerMembership, LeaderboardSnapshot, LeaderboardSnapshotMeta
+from util.util import period_range
+
+SNAPSHOT_PERIODS = ('daily', 'weekly', 'monthly', 'yearly', 'all time')
+GLOBAL_SCOPE_ID = 0
+SNAPSHOT_COLUMNS = ['scope_id', 'period', 'user_id', 'rank', 'score', 'games_played']
+
+def snapshot_select(period: str, date_range: tuple | None, per_server: bool):
+    # Ranks every user for one period, either once globally or once per server through a partitioned window
+    score_expr = func.max(WordleData.wordle_score) if period == 'daily' else func.avg(WordleData.wordle_score)
+    if per_server:
+        scope_expr = ServerMembership.server_id
+        rank_expr = func.rank().over(partition_by = ServerMembership.server_id, order_by = score_expr)
+        query = select(scope_expr, literal(period), WordleData.user_id, rank_expr, score_expr, func.count()).join(
+            ServerMembership, ServerMembership.user_id == WordleData.user_id
+        ).group_by(ServerMembership.server_id, WordleData.user_id)
+    else:
+        rank_expr = func.rank().over(order_by = score_expr)
+        query = select(literal(GLOBAL_SCOPE_ID), literal(period), WordleData.user_id, rank_expr, score_expr, func.count()).group_by(WordleData.user_id)
+    if date_range is not None:
+        query = query.where(WordleData.wordle_date >= date_range[0], WordleData.wordle_date < date_range[1])
+    return query
+
+def refresh_snapshots() -> datetime | None:
+    # Each period is swapped in its own transaction, so readers see either the old or the new ranking, never a mix
+    session = get_session()
+    try:
+        for period in SNAPSHOT_PERIODS:
+            # Each commit hands the connection back, so the isolation level is set again for every period's transaction
+            use_read_committed(session)
+            # refreshed_at is taken before the read, so its PST date is always the day the period was computed for
+            refreshed_at = datetime.now(timezone.utc).replace(tzinfo = None)
+            today_date = refreshed_at.replace(tzinfo = timezone.utc).astimezone(ZoneInfo('America/Los_Angeles')).date()
+            date_range = period_range(period, today_date)
+            session.execute(delete(LeaderboardSnapshot).where(LeaderboardSnapshot.period == period))
+            for per_server in (False, True):
+                session.execute(insert(LeaderboardSnapshot).from_select(SNAPSHOT_COLUMNS, snapshot_select(period, date_range, per_server)))
+            session.execute(
+                insert(LeaderboardSnapshotMeta).values(period = period, refreshed_at = refreshed_at)
+                .on_duplicate_key_update(refreshed_at = refreshed_at)
+            )
+            session.commit()
+        return refreshed_at
+
+    except SQLAlchemyError as e:
+        session.rollback()
+        print(f'Database error in refresh_snapshots: {e}')
+        return None
+
+    finally:
+        session.close()
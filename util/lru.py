@@ -0,0 +1,53 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+class LRUCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last = False)
+
+    def pop(self, key: Hashable) -> Any | None:
+        return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class ScopeVersions:
+    # Version counters for cache keys: bump(scope) invalidates one scope's entries and bump_all() every scope's.
+    # With a TTL, keys also roll over on a clock so changes made by other bot processes show up.
+    def __init__(self, ttl: int = 0) -> None:
+        self.ttl = ttl
+        self._versions: dict[Hashable, int] = {}
+        self._generation = 0
+
+    def version(self, scope: Hashable) -> int:
+        return self._versions.get(scope, 0)
+
+    def bump(self, scope: Hashable) -> None:
+        self._versions[scope] = self.version(scope) + 1
+
+    def bump_all(self) -> None:
+        self._generation += 1
+
+    def key(self, scope: Hashable) -> tuple:
+        ttl_bucket = int(time.time() // self.ttl) if self.ttl else 0
+        return (self._generation, self.version(scope), ttl_bucket)
@@ -0,0 +1,147 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_labels(labelnames: tuple[str, ...], labelvalues: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Metric:
+    # Observed from the event loop and from database threads, so every update takes the lock
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = sorted(self._values.items(), key = lambda item: tuple(str(v) for v in item[0]))
+            lines.extend(self._render_samples(values))
+        return lines
+
+    def _render_samples(self, values: list) -> list[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, values: list) -> list[str]:
+        return [f'{self.name}_total{format_labels(self.labelnames, key)} {value}' for key, value in values]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, values: list) -> list[str]:
+        lines = []
+        for key, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            inf_labels = format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{inf_labels} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labelnames, key)} {count}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+COMMAND_LATENCY = registry.histogram('wordlebot_command_seconds', 'Time to handle a command, from invocation to reply', ('command',))
+SUBMISSION_LATENCY = registry.histogram('wordlebot_submission_seconds', 'Time from receiving a Wordle message to storing it')
+WORDLE_PREFILTER = registry.counter('wordlebot_wordle_prefilter', 'Guild messages by Wordle prefilter outcome: miss (ruled out by prefix and length), unmatched (failed the pattern), hit', ('result',))
+SUBMISSIONS = registry.counter('wordlebot_submissions', 'Wordle submissions by outcome', ('result',))
+SQL_LATENCY = registry.histogram('wordlebot_sql_seconds', 'Time spent in a database call', ('call_site',))
+RENDER_LATENCY = registry.histogram('wordlebot_render_seconds', 'Time spent drawing an image in a render worker, excluding PNG encoding', ('image',))
+ENCODE_LATENCY = registry.histogram('wordlebot_encode_seconds', 'Time spent encoding a rendered image as PNG', ('image',))
+AVATAR_FETCH_LATENCY = registry.histogram('wordlebot_avatar_fetch_seconds', 'Time to download an avatar', ('result',))
+CACHE_REQUESTS = registry.counter('wordlebot_cache_requests', 'Cache lookups by cache and outcome', ('cache', 'result'))
+
+class MetricsServer:
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._runner: web.AppRunner | None = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text = registry.render(), content_type = 'text/plain')
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log = None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f'METRICS SERVING ON http://{self.host}:{self.port}/metrics')
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
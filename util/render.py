@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Callable
+from PIL import Image, ImageDraw, ImageFont
+import config
+from util.assets import assets, AVATAR_SIZE
+from util.lru import LRUCache
+from util.metrics import RENDER_LATENCY, ENCODE_LATENCY
+
+def shorten_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, max_width: int) -> str:
+    if draw.textlength(text, font = font) <= max_width:
+        return text
+    ellipsis = '...'
+    ellipsis_width = draw.textlength(ellipsis, font = font)
+    available_width = max_width - ellipsis_width
+    for i in range(len(text), 0, -1):
+        if draw.textlength(text[:i], font = font) <= available_width:
+            return text[:i] + ellipsis
+    return ellipsis
+
+# Seconds this worker has spent in encode_png during the current timed_render call
+_encode_seconds = 0.0
+
+def encode_png(img: Image.Image) -> bytes:
+    global _encode_seconds
+    start = time.perf_counter()
+    buf = BytesIO()
+    img.save(buf, format = 'PNG', optimize = True)
+    _encode_seconds += time.perf_counter() - start
+    return buf.getvalue()
+
+def timed_render(func: Callable[..., bytes], *args: Any) -> tuple[bytes, float, float]:
+    # Runs in a render worker, whose metrics the bot can't see, so the timings travel back with the image
+    global _encode_seconds
+    _encode_seconds = 0.0
+    start = time.perf_counter()
+    png = func(*args)
+    total = time.perf_counter() - start
+    return png, total - _encode_seconds, _encode_seconds
+
+LEADERBOARD_WIDTH = 1600
+LEADERBOARD_HEADER_HEIGHT = 70
+LEADERBOARD_ROW_HEIGHT = 110
+WHITE = (255, 255, 255)
+TRANSPARENT = (0, 0, 0, 0)
+
+DAILY_COLUMNS = {
+    'rank_x': 40,
+    'avatar_x': 180,
+    'name_x': 300,
+    'name_width': 1070,
+    'score_x': 1370,
+    'score_width': 200
+}
+PERIOD_COLUMNS = {
+    'rank_x': 40,
+    'avatar_x': 180,
+    'name_x': 300,
+    'name_width': 800,
+    'average_x': 1100,
+    'average_width': 180,
+    'games_x': 1370,
+    'games_width': 200
+}
+
+# Layers are cached per worker process; two viewers of the same page only differ by which tile is bold
+_header_layers: dict[bool, Image.Image] = {}
+_row_tiles = LRUCache(config.RENDER_TILE_CACHE_SIZE)
+
+def leaderboard_header(is_daily: bool) -> Image.Image:
+    layer = _header_layers.get(is_daily)
+    if layer is not None:
+        return layer
+
+    columns = DAILY_COLUMNS if is_daily else PERIOD_COLUMNS
+    bold_font = assets.font('bold', 60)
+    layer = Image.new('RGBA', (LEADERBOARD_WIDTH, LEADERBOARD_HEADER_HEIGHT + 20), TRANSPARENT)
+    draw = ImageDraw.Draw(layer)
+
+    top_margin = 0
+    rank_header_text = 'Rank'
+    rank_header_w = draw.textlength(rank_header_text, font = bold_font)
+    rank_header_x = columns['rank_x'] + ((columns['avatar_x'] - columns['rank_x']) - rank_header_w) / 2
+    draw.text((rank_header_x, top_margin), rank_header_text, font = bold_font, fill = WHITE)
+
+    draw.text((columns['name_x'], top_margin), 'Player', font = bold_font, fill = WHITE)
+
+    if is_daily:
+        score_header_text = 'Score'
+        score_header_w = draw.textlength(score_header_text, font = bold_font)
+        score_header_x = columns['score_x'] + (columns['score_width'] - score_header_w) / 2
+        draw.text((score_header_x, top_margin), score_header_text, font = bold_font, fill = WHITE)
+    else:
+        avg_header_text = 'Average'
+        avg_header_w = draw.textlength(avg_header_text, font = bold_font)
+        avg_header_x = columns['average_x'] + (columns['average_width'] - avg_header_w) / 2
+        draw.text((avg_header_x, top_margin), avg_header_text, font = bold_font, fill = WHITE)
+
+        games_header_text = 'Games'
+        games_header_w = draw.textlength(games_header_text, font = bold_font)
+        games_header_x = columns['games_x'] + (columns['games_width'] - games_header_w) / 2
+        draw.text((games_header_x, top_margin), games_header_text, font = bold_font, fill = WHITE)
+
+    line_y = LEADERBOARD_HEADER_HEIGHT
+    draw.line([(40, line_y), (LEADERBOARD_WIDTH - 40, line_y)], fill = WHITE, width = 4)
+
+    _header_layers[is_daily] = layer
+    return layer
+
+def leaderboard_row(entry: tuple, avatar_bytes: bytes, is_daily: bool, bold: bool, rank_left_x: float, games_left_x: float | None) -> Image.Image:
+    # Rank and games columns are aligned across the page, so their offsets are part of the tile key
+    tile_key = (is_daily, tuple(entry[:-1]), hashlib.sha1(avatar_bytes).digest(), bold, rank_left_x, games_left_x)
+    tile = _row_tiles.get(tile_key)
+    if tile is not None:
+        return tile
+
+    columns = DAILY_COLUMNS if is_daily else PERIOD_COLUMNS
+    bold_font = assets.font('bold', 60)
+    regular_font = assets.font('medium', 60)
+    name_font = bold_font if bold else regular_font
+    stats_font = bold_font if bold else regular_font
+
+    tile = Image.new('RGBA', (LEADERBOARD_WIDTH, LEADERBOARD_ROW_HEIGHT), TRANSPARENT)
+    draw = ImageDraw.Draw(tile)
+
+    rank, display_name = entry[0], entry[-2]
+    draw.text((rank_left_x, 20), f'{rank}.', font = bold_font, fill = WHITE)
+    avatar_img = Image.frombytes('RGBA', (AVATAR_SIZE, AVATAR_SIZE), avatar_bytes)
+    tile.paste(avatar_img, (columns['avatar_x'], 5), avatar_img)
+
+    if len(display_name) > 32:
+        display_name = display_name[:32]
+    name_max_width = columns['name_width'] - 20
+    display_name = shorten_text(draw, display_name, name_font, name_max_width)
+    draw.text((columns['name_x'], 25), display_name, font = name_font, fill = WHITE)
+
+    if is_daily:
+        score_str = str(entry[2])
+        score_w = draw.textlength(score_str, font = stats_font)
+        score_x = columns['score_x'] + (columns['score_width'] - score_w) / 2
+        draw.text((score_x, 25), score_str, font = stats_font, fill = WHITE)
+    else:
+        avg_str = f'{entry[2]:.2f}'
+        avg_w = draw.textlength(avg_str, font = stats_font)
+        avg_x = columns['average_x'] + (columns['average_width'] - avg_w) / 2
+        draw.text((avg_x, 25), avg_str, font = stats_font, fill = WHITE)
+
+        draw.text((games_left_x, 25), str(entry[3]), font = regular_font, fill = WHITE)
+
+    _row_tiles.put(tile_key, tile)
+    return tile
+
+def render_leaderboard(page_entries: list, avatars: list[bytes], is_daily: bool, current_user_id: int) -> bytes:
+    columns = DAILY_COLUMNS if is_daily else PERIOD_COLUMNS
+    bold_font = assets.font('bold', 60)
+    regular_font = assets.font('medium', 60)
+
+    rank_texts = [f'{entry[0]}.' for entry in page_entries]
+    max_rank_width = max(bold_font.getlength(text) for text in rank_texts) if rank_texts else 0
+    rank_column_width = columns['avatar_x'] - 40
+    rank_left_x = 40 + (rank_column_width - max_rank_width) / 2
+
+    games_left_x = None
+    if not is_daily:
+        games_texts = [str(entry[3]) for entry in page_entries]
+        max_games_width = max(regular_font.getlength(text) for text in games_texts) if games_texts else 0
+        games_left_x = columns['games_x'] + (columns['games_width'] - max_games_width) / 2
+
+    header = leaderboard_header(is_daily)
+    img = Image.new('RGBA', (LEADERBOARD_WIDTH, header.height + LEADERBOARD_ROW_HEIGHT * len(page_entries) + 20), TRANSPARENT)
+    img.paste(header, (0, 0))
+
+    y_offset = header.height
+    for entry, avatar_bytes in zip(page_entries, avatars):
+        tile = leaderboard_row(entry, avatar_bytes, is_daily, entry[1] == current_user_id, rank_left_x, games_left_x)
+        img.paste(tile, (0, y_offset))
+        y_offset += LEADERBOARD_ROW_HEIGHT
+
+    return encode_png(img)
+
+def render_stats(total_games: int, win_percentage: str, average_score: float, current_streak: int, longest_streak: int, score_counts: dict) -> bytes:
+    white = (255, 255, 255)
+    green_bar = (46, 204, 112)
+    gray_bar = (100, 100, 100)
+
+    width, height = 800, 600
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+
+    number_size = 60
+    text_size = 30
+    number_font = assets.font('bold', number_size)
+    regular_font = assets.font('medium', text_size)
+    bold_font = assets.font('bold', text_size)
+
+    y_start = 0
+    text_buffer = 10
+    column_width = width / 5
+
+    stats_list = [
+        (total_games, 'Played'),
+        (win_percentage, 'Win %'),
+        (f'{average_score:.1f}', 'Average'),
+        (current_streak, ('Current', 'Streak')),
+        (longest_streak, ('Max', 'Streak'))
+    ]
+
+    for i, (stat_value, label) in enumerate(stats_list):
+        center_x = (i * column_width) + (column_width / 2)
+        stat_text = str(stat_value)
+        stat_bbox = draw.textbbox((0, 0), stat_text, font = number_font)
+        stat_width = stat_bbox[2] - stat_bbox[0]
+        stat_x = center_x - (stat_width / 2)
+        draw.text((stat_x, y_start), stat_text, fill = white, font = number_font)
+
+        if isinstance(label, tuple):
+            line1, line2 = label
+            line1_bbox = draw.textbbox((0, 0), line1, font = regular_font)
+            line2_bbox = draw.textbbox((0, 0), line2, font = regular_font)
+            line1_w = line1_bbox[2] - line1_bbox[0]
+            line2_w = line2_bbox[2] - line2_bbox[0]
+            line1_x = center_x - (line1_w / 2)
+            line2_x = center_x - (line2_w / 2)
+            line1_y = y_start + number_size + text_buffer
+            line2_y = line1_y + text_size
+            draw.text((line1_x, line1_y), line1, fill = white, font = regular_font)
+            draw.text((line2_x, line2_y), line2, fill = white, font = regular_font)
+        else:
+            label_bbox = draw.textbbox((0, 0), label, font = regular_font)
+            label_width = label_bbox[2] - label_bbox[0]
+            label_x = center_x - (label_width / 2)
+            draw.text((label_x, y_start + number_size + text_buffer), label, fill = white, font = regular_font)
+
+    graph_title = 'Guess Distribution'
+    title_y = number_size + (text_size * 2) + 40
+    title_x = 50
+    draw.text((title_x, title_y), graph_title, fill = white, font = bold_font)
+
+    bar_start_x = 50
+    bar_start_y = title_y + 50
+    max_bar_width = 700
+    bar_height = 45
+    bar_spacing = 10
+    guesses = ['1', '2', '3', '4', '5', '6', 'X']
+    largest_count = max(score_counts.values())
+
+    for i, guess in enumerate(guesses):
+        count = score_counts.get(guess, 0)
+        y_pos = bar_start_y + i * (bar_height + bar_spacing)
+        label_bbox = draw.textbbox((0, 0), guess, font = regular_font)
+        label_height = label_bbox[3] - label_bbox[1]
+        label_y = y_pos + (bar_height - label_height) / 6
+        draw.text((10, label_y), guess, fill = white, font = regular_font)
+        bar_fraction = (count / total_games)
+        bar_width = bar_fraction * max_bar_width
+        color = green_bar if (count == largest_count and count > 0) else gray_bar
+        draw.rectangle([bar_start_x, y_pos, bar_start_x + bar_width, y_pos + bar_height], fill = color)
+        count_str = str(count)
+        count_bbox = draw.textbbox((0, 0), count_str, font = regular_font)
+        text_w = count_bbox[2] - count_bbox[0]
+        text_y = label_y
+        margin = 5
+        if bar_width >= text_w + margin:
+            text_x = bar_start_x + bar_width - text_w - margin
+        else:
+            text_x = bar_start_x + bar_width + margin
+        draw.text((text_x, text_y), count_str, fill = white, font = regular_font)
+
+    return encode_png(img)
+
+class RenderPool:
+    def __init__(self, max_workers: int, max_pending: int, timeout: float) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pending = asyncio.Semaphore(max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked so workers don't inherit the bot's sockets and event loop
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers = self.max_workers, mp_context = multiprocessing.get_context('spawn'), initializer = assets.load)
+        return self._executor
+
+    async def render(self, func: Callable[..., bytes], *args: Any) -> bytes:
+        # Waiting callers queue on the semaphore, so at most max_pending jobs sit in the executor. Cancelling the
+        # caller (or hitting the timeout) only cancels a job that hasn't started; one already running keeps its
+        # slot until it finishes, so abandoned renders can't pile up past the limit.
+        await self._pending.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            executor = self._get_executor()
+            job = executor.submit(timed_render, func, *args)
+        except BaseException as e:
+            self._pending.release()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._pending.release))
+
+        try:
+            png, render_seconds, encode_seconds = await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory), which fails every job in the pool; the next render starts a new one
+            self._discard(executor)
+            raise
+        RENDER_LATENCY.observe(render_seconds, image = func.__name__)
+        ENCODE_LATENCY.observe(encode_seconds, image = func.__name__)
+        return png
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # Concurrent renders all see the same broken pool, and only the first should replace it
+        if self._executor is executor:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait = False, cancel_futures = True)
+            self._executor = None
+
+render_pool = RenderPool(config.RENDER_WORKERS, config.RENDER_MAX_PENDING, config.RENDER_TIMEOUT)
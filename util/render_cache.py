@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Hashable
+from zoneinfo import ZoneInfo
+import config
+from util.lru import LRUCache, ScopeVersions
+from util.metrics import CACHE_REQUESTS
+
+GLOBAL_SCOPE = 'global'
+
+class LeaderboardCache:
+    def __init__(self, max_boards: int, max_pages: int, ttl: int = 0) -> None:
+        self._versions = ScopeVersions(ttl)
+        self._boards = LRUCache(max_boards)
+        self._pages = LRUCache(max_pages)
+
+    def bump(self, scope: Hashable) -> None:
+        self._versions.bump(scope)
+
+    def bump_all(self) -> None:
+        self._versions.bump_all()
+
+    def board_key(self, scope: Hashable, period: str, display_server_id: int | None) -> tuple:
+        # Today's PST date is part of the key so period boards roll over at midnight without a submission
+        today_date = datetime.now(ZoneInfo('America/Los_Angeles')).date()
+        return (scope, self._versions.key(scope), period, today_date, display_server_id)
+
+    def get_board(self, board_key: tuple) -> dict | None:
+        board = self._boards.get(board_key)
+        CACHE_REQUESTS.inc(cache = 'leaderboard_board', result = 'miss' if board is None else 'hit')
+        return board
+
+    def put_board(self, board_key: tuple, rows: list) -> dict:
+        # Rows are loaded a page at a time; exhausted marks that the last one has been fetched
+        board = {'rows': rows, 'ranks': {}, 'exhausted': False, 'refreshed_at': None}
+        self._boards.put(board_key, board)
+        return board
+
+    def get_page(self, board_key: tuple, page: int, user_id: int, forcibly_append: bool) -> bytes | None:
+        png = self._pages.get((board_key, page, user_id, forcibly_append))
+        CACHE_REQUESTS.inc(cache = 'leaderboard_page', result = 'miss' if png is None else 'hit')
+        return png
+
+    def put_page(self, board_key: tuple, page: int, user_id: int, forcibly_append: bool, png: bytes) -> None:
+        self._pages.put((board_key, page, user_id, forcibly_append), png)
+
+leaderboard_cache = LeaderboardCache(config.LEADERBOARD_CACHE_BOARDS, config.LEADERBOARD_CACHE_PAGES, config.LEADERBOARD_CACHE_TTL)
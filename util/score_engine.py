@@ -0,0 +1,181 @@
+import threading
+from datetime import date
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select
+from database.connection import get_session
+from database.models import WordleData
+from util.util import period_range
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+LOAD_CHUNK_SIZE = 50000
+MIN_CAPACITY = 1024
+
+def day_number(value: date) -> int:
+    return value.toordinal() - EPOCH_ORDINAL
+
+class ScoreEngine:
+    # Holds every (user_id, day, score) row of wordle_data in parallel NumPy arrays and ranks global leaderboards from them.
+    # Arrays are over-allocated so appends are amortised O(1); readers take views of the filled prefix under the lock,
+    # which stay valid even if a later append moves the data to a bigger buffer.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._user_ids = None
+        self._days = None
+        self._scores = None
+        self._size = 0
+        self._version = 0
+        self._ranking_key = None
+        self._ranking = None
+        # Rows appended while load() is reading wordle_data, replayed once its arrays are swapped in
+        self._pending: list[dict] | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._user_ids is not None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def load(self) -> bool:
+        if np is None:
+            print('NumPy is not installed, leaderboards will be aggregated in SQL')
+            return False
+
+        with self._lock:
+            self._pending = []
+        session = get_session()
+        try:
+            user_id_chunks, day_chunks, score_chunks, wordle_id_chunks = [], [], [], []
+            result = session.execute(
+                select(WordleData.user_id, WordleData.wordle_date, WordleData.wordle_score, WordleData.wordle_id).execution_options(yield_per = LOAD_CHUNK_SIZE)
+            )
+            for rows in result.partitions():
+                user_id_chunks.append(np.fromiter((row[0] for row in rows), dtype = np.int64, count = len(rows)))
+                day_chunks.append(np.fromiter((day_number(row[1]) for row in rows), dtype = np.int32, count = len(rows)))
+                score_chunks.append(np.fromiter((row[2] for row in rows), dtype = np.int8, count = len(rows)))
+                wordle_id_chunks.append(np.fromiter((row[3] for row in rows), dtype = np.int32, count = len(rows)))
+
+            size = sum(len(chunk) for chunk in user_id_chunks)
+            capacity = max(MIN_CAPACITY, size * 2)
+            user_ids = np.zeros(capacity, dtype = np.int64)
+            days = np.zeros(capacity, dtype = np.int32)
+            scores = np.zeros(capacity, dtype = np.int8)
+            if size:
+                user_ids[:size] = np.concatenate(user_id_chunks)
+                days[:size] = np.concatenate(day_chunks)
+                scores[:size] = np.concatenate(score_chunks)
+
+            with self._lock:
+                pending, self._pending = self._pending or [], None
+                if pending and size:
+                    # Rows committed just before the SELECT can be both read by it and replayed, so those are dropped
+                    wordle_ids = np.concatenate(wordle_id_chunks)
+                    seen = np.isin(user_ids[:size], np.fromiter({w['user_id'] for w in pending}, dtype = np.int64))
+                    loaded_keys = set(zip(user_ids[:size][seen].tolist(), wordle_ids[seen].tolist()))
+                    pending = [w for w in pending if (w['user_id'], w['wordle_id']) not in loaded_keys]
+                self._user_ids, self._days, self._scores = user_ids, days, scores
+                self._size = size
+                self._version += 1
+                if pending:
+                    self._append_locked(pending)
+            print(f'SCORE ENGINE LOADED ({size} wordles, {len(pending)} appended during the load)')
+            return True
+
+        except SQLAlchemyError as e:
+            with self._lock:
+                self._pending = None
+            print(f'Database error in ScoreEngine.load: {e}')
+            return False
+
+        finally:
+            session.close()
+
+    def append(self, wordles: list[dict]) -> None:
+        if not wordles:
+            return
+
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(wordles)
+            if self._user_ids is not None:
+                self._append_locked(wordles)
+
+    def _append_locked(self, wordles: list[dict]) -> None:
+        # Caller holds the lock
+        new_size = self._size + len(wordles)
+        if new_size > len(self._user_ids):
+            capacity = max(new_size, len(self._user_ids) * 2)
+            self._user_ids = np.resize(self._user_ids, capacity)
+            self._days = np.resize(self._days, capacity)
+            self._scores = np.resize(self._scores, capacity)
+        self._user_ids[self._size:new_size] = [w['user_id'] for w in wordles]
+        self._days[self._size:new_size] = [day_number(w['wordle_date']) for w in wordles]
+        self._scores[self._size:new_size] = [w['wordle_score'] for w in wordles]
+        self._size = new_size
+        self._version += 1
+
+    def ranking(self, period: str, today_date: date) -> tuple:
+        # Returns (user_ids, scores, games_played, ranks) sorted by (score, user_id), with RANK() semantics for ties
+        with self._lock:
+            key = (period, today_date, self._version)
+            if self._ranking_key == key:
+                return self._ranking
+            user_ids = self._user_ids[:self._size]
+            days = self._days[:self._size]
+            scores = self._scores[:self._size]
+
+        date_range = period_range(period, today_date)
+        if date_range is not None:
+            mask = (days >= day_number(date_range[0])) & (days < day_number(date_range[1]))
+            user_ids = user_ids[mask]
+            scores = scores[mask]
+
+        unique_user_ids, inverse = np.unique(user_ids, return_inverse = True)
+        games_played = np.bincount(inverse, minlength = len(unique_user_ids))
+        if period == 'daily':
+            user_scores = np.zeros(len(unique_user_ids), dtype = np.int16)
+            np.maximum.at(user_scores, inverse, scores)
+        else:
+            user_scores = np.bincount(inverse, weights = scores, minlength = len(unique_user_ids)) / games_played
+
+        order = np.lexsort((unique_user_ids, user_scores))
+        sorted_scores = user_scores[order]
+        ranks = np.searchsorted(sorted_scores, sorted_scores, side = 'left') + 1
+        ranking = (unique_user_ids[order], sorted_scores, games_played[order], ranks)
+
+        with self._lock:
+            if key[2] == self._version:
+                self._ranking_key, self._ranking = key, ranking
+        return ranking
+
+    def leaderboard(self, period: str, today_date: date, limit: int, after: tuple | None = None, user_id: int | None = None) -> tuple[list, tuple | None]:
+        # Same paging contract as the SQL leaderboard: rows of (rank, user_id, score, games_played) after the (score, user_id) seek position
+        user_ids, scores, games_played, ranks = self.ranking(period, today_date)
+
+        start = 0
+        if after is not None:
+            after_score, after_user_id = after
+            low = int(np.searchsorted(scores, after_score, side = 'left'))
+            high = int(np.searchsorted(scores, after_score, side = 'right'))
+            start = low + int(np.searchsorted(user_ids[low:high], after_user_id, side = 'right'))
+
+        rows = [
+            (int(ranks[i]), int(user_ids[i]), scores[i].item(), int(games_played[i]))
+            for i in range(start, min(start + limit, len(user_ids)))
+        ]
+
+        user_record = None
+        if user_id is not None:
+            matches = np.flatnonzero(user_ids == user_id)
+            if len(matches):
+                i = matches[0]
+                user_record = (int(ranks[i]), int(user_ids[i]), scores[i].item(), int(games_played[i]))
+        return rows, user_record
+
+score_engine = ScoreEngine()
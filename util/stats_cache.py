@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+from pathlib import Path
+import config
+from util.files import atomic_write
+from util.lru import LRUCache, ScopeVersions
+from util.metrics import CACHE_REQUESTS
+
+# Part of every disk key; bump it when render_stats draws a different card from the same numbers
+CARD_FORMAT = 1
+
+class StatsCardCache:
+    # Memory entries are keyed by a per-user version that accepted submissions bump, so a hit skips both the
+    # stats query and the render. Versions restart at 0 with the process, so disk entries are instead checked
+    # against a hash of the card's inputs: a disk hit still reads the stats but skips the render.
+    def __init__(self, max_entries: int, cache_dir: str, ttl: int = 0) -> None:
+        self._versions = ScopeVersions(ttl)
+        self._memory = LRUCache(max_entries)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents = True, exist_ok = True)
+
+    def bump(self, user_id: int) -> None:
+        self._versions.bump(user_id)
+
+    def bump_all(self) -> None:
+        self._versions.bump_all()
+
+    def key(self, user_id: int) -> tuple:
+        return (user_id, self._versions.key(user_id))
+
+    def get(self, key: tuple) -> bytes | None:
+        png = self._memory.get(key)
+        CACHE_REQUESTS.inc(cache = 'stats_card_memory', result = 'miss' if png is None else 'hit')
+        return png
+
+    def put(self, key: tuple, png: bytes) -> None:
+        self._memory.put(key, png)
+
+    @staticmethod
+    def _card_hash(card_args: tuple) -> bytes:
+        return hashlib.sha1(repr((CARD_FORMAT, card_args)).encode()).hexdigest().encode()
+
+    def _disk_path(self, user_id: int) -> Path:
+        # One file per user, the input hash on the first line and the PNG after it, so the directory never outgrows the user count
+        return self.cache_dir / f'{user_id}.card'
+
+    def _read_rendered(self, user_id: int, card_args: tuple) -> bytes | None:
+        try:
+            data = self._disk_path(user_id).read_bytes()
+        except OSError:
+            data = b''
+        card_hash, _, png = data.partition(b'\n')
+        if not png or card_hash != self._card_hash(card_args):
+            CACHE_REQUESTS.inc(cache = 'stats_card_disk', result = 'miss')
+            return None
+        CACHE_REQUESTS.inc(cache = 'stats_card_disk', result = 'hit')
+        return png
+
+    def _write_rendered(self, user_id: int, card_args: tuple, png: bytes) -> None:
+        disk_path = self._disk_path(user_id)
+        try:
+            atomic_write(disk_path, self._card_hash(card_args) + b'\n' + png)
+        except OSError as e:
+            print(f'Could not write stats card cache file {disk_path}: {e}')
+
+    async def get_rendered(self, user_id: int, card_args: tuple) -> bytes | None:
+        if self.cache_dir is None:
+            return None
+        return await asyncio.to_thread(self._read_rendered, user_id, card_args)
+
+    async def store_rendered(self, user_id: int, card_args: tuple, png: bytes) -> None:
+        if self.cache_dir is not None:
+            await asyncio.to_thread(self._write_rendered, user_id, card_args, png)
+
+stats_card_cache = StatsCardCache(config.STATS_CACHE_SIZE, config.STATS_CACHE_DIR, config.STATS_CACHE_TTL)
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Callable
+from database.connection import run_db
+from util.util import submit_wordles
+
+# A failed batch is tried this many times before it is split up, since deadlocks against other writers are transient
+SUBMIT_ATTEMPTS = 2
+SUBMIT_RETRY_DELAY = 0.1
+
+class SubmissionQueue:
+    def __init__(self, max_batch_size: int, flush_interval: float, on_commit: Callable[[set[int], list[dict]], None] | None = None) -> None:
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.on_commit = on_commit
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # A None sentinel lets the worker flush everything queued ahead of it before exiting
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        # Anything submitted after the sentinel is failed rather than left waiting on a worker that has gone
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None and not item[1].done():
+                item[1].set_result(None)
+
+    async def submit(self, submission: dict) -> bool | None:
+        if self._task is None:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((submission, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _submit(self, submissions: list[dict]) -> tuple | None:
+        for attempt in range(SUBMIT_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(SUBMIT_RETRY_DELAY)
+            try:
+                committed = await run_db(submit_wordles, submissions)
+            except Exception as e:
+                print(f'Error flushing submission batch: {e}')
+                committed = None
+            if committed is not None:
+                return committed
+        return None
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        committed = await self._submit([submission for submission, _ in batch])
+        if committed is None and len(batch) > 1:
+            # Submitted one at a time so a bad row or a lost deadlock only fails its own Wordle, not the whole batch
+            for item in batch:
+                await self._flush([item])
+            return
+
+        results = [None] * len(batch) if committed is None else committed[0]
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        # The batch is already resolved, so a failing callback can't strand its submitters or stop the worker
+        if committed is not None and self.on_commit is not None and any(results):
+            _, affected_server_ids, stored_wordles = committed
+            try:
+                self.on_commit(affected_server_ids, stored_wordles)
+            except Exception as e:
+                print(f'Error in submission commit callback: {e}')
@@ -1,29 +1,69 @@
 import discord
 from discord.ext import commands
+from typing import Callable
+from datetime import date, datetime, timedelta, timezone
 from sqlalchemy.exc import SQLAlchemyError
-from database.connection import get_session
-from database.models import User, ServerData, ServerMembership, WordleData, WordleServerMembership
+from sqlalchemy import tuple_, func, case, select, delete
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+from database.connection import get_session, use_read_committed
+from database.models import User, ServerData, ServerMembership, WordleData, WordleServerMembership, UserStats, BackfillCheckpoint, FAILED_SCORE
 
-def add_user(user: discord.User) -> None:
-    session = get_session()
-    try:
-        existing_user = session.query(User).filter(User.user_id == user.id).first()
-        if not existing_user:
-            new_user = User(user_id = user.id, user_name = user.name, avatar = user.display_avatar.replace(format = 'png').url)
-            session.add(new_user)
-        else:
-            existing_user.user_name = user.name
-            existing_user.avatar = user.display_avatar.replace(format = 'png').url
-        session.commit()
+SCORE_COLUMNS = {
+    1: 'score_1',
+    2: 'score_2',
+    3: 'score_3',
+    4: 'score_4',
+    5: 'score_5',
+    6: 'score_6',
+    FAILED_SCORE: 'score_x'
+}
+COUNT_COLUMNS = [*SCORE_COLUMNS.values(), 'total_games', 'score_sum']
+STREAK_COLUMNS = ['current_streak', 'longest_streak', 'last_wordle_number']
+USER_STATS_COLUMNS = [*COUNT_COLUMNS, *STREAK_COLUMNS]
+STREAK_RECOUNT_CHUNK_SIZE = 1000
+MEMBER_SYNC_CHUNK_SIZE = 1000
 
-    except SQLAlchemyError as e:
-        print(f'Database error in add_user: {e}')
-        session.rollback()
+def score_value(wordle_score: str) -> int:
+    return FAILED_SCORE if wordle_score == 'X' else int(wordle_score)
 
-    finally:
-        session.close()
+def score_label(wordle_score: int) -> str:
+    return 'X' if wordle_score == FAILED_SCORE else str(wordle_score)
+
+def wordle_number(wordle_id: str) -> int:
+    return int(wordle_id.replace(',', ''))
 
-async def add_server(server_id: int) -> None:
+def streaks_from_numbers(numbers: list[int]) -> tuple[int, int, int]:
+    # numbers must be sorted ascending; returns (current streak, longest streak, last Wordle number)
+    longest_streak = 1
+    current_streak = 1
+    for i in range(1, len(numbers)):
+        if numbers[i] - numbers[i - 1] == 1:
+            current_streak += 1
+        else:
+            current_streak = 1
+        longest_streak = max(longest_streak, current_streak)
+    return current_streak, longest_streak, numbers[-1]
+
+def period_range(period: str, today_date: date) -> tuple[date, date] | None:
+    # Half-open [start, end) date ranges so period filters can use the wordle_date index.
+    # Weeks start on Sunday and are clipped to the current year, matching MySQL's WEEK(date, 0) with a YEAR filter.
+    year_start = date(today_date.year, 1, 1)
+    next_year_start = date(today_date.year + 1, 1, 1)
+    if period == 'daily':
+        return today_date, today_date + timedelta(days = 1)
+    elif period == 'weekly':
+        week_start = today_date - timedelta(days = (today_date.weekday() + 1) % 7)
+        return max(week_start, year_start), min(week_start + timedelta(days = 7), next_year_start)
+    elif period == 'monthly':
+        month_start = today_date.replace(day = 1)
+        next_month_start = (month_start + timedelta(days = 32)).replace(day = 1)
+        return month_start, next_month_start
+    elif period == 'yearly':
+        return year_start, next_year_start
+    return None
+
+def add_server(server_id: int) -> None:
     session = get_session()
     try:
         existing_server = session.query(ServerData).filter(ServerData.server_id == server_id).first()
@@ -39,67 +79,318 @@ async def add_server(server_id: int) -> None:
     finally:
         session.close()
 
-def add_server_membership(user_id: int, server_id: int, display_name: str) -> None:
+def submit_wordles(submissions: list[dict]) -> tuple[list[bool], set[int], list[dict]] | None:
     session = get_session()
     try:
-        existing_membership = session.query(ServerMembership).filter(
-            ServerMembership.user_id == user_id,
-            ServerMembership.server_id == server_id
-            ).first()
-        if not existing_membership:
-            new_membership = ServerMembership(user_id = user_id, server_id = server_id, display_name = display_name)
-            session.add(new_membership)
+        users = {s['user_id']: s for s in submissions}
+        user_stmt = insert(User).values([
+            {'user_id': s['user_id'], 'user_name': s['user_name'], 'avatar': s['avatar']} for s in users.values()
+        ])
+        session.execute(user_stmt.on_duplicate_key_update(user_name = user_stmt.inserted.user_name, avatar = user_stmt.inserted.avatar))
+
+        # Backfilled Wordles from authors who have since left the server are stored without putting them back on its leaderboards
+        memberships = {(s['user_id'], s['server_id']): s for s in submissions if s.get('is_member', True)}
+        if memberships:
+            membership_stmt = insert(ServerMembership).values([
+                {'user_id': s['user_id'], 'server_id': s['server_id'], 'display_name': s['display_name']} for s in memberships.values()
+            ])
+            session.execute(membership_stmt.on_duplicate_key_update(display_name = membership_stmt.inserted.display_name))
+
+        wordle_keys = {(s['user_id'], s['wordle_id']) for s in submissions}
+        existing_wordles = session.query(
+            WordleData.user_id,
+            WordleData.wordle_id,
+            WordleData.wordle_grid
+            ).filter(tuple_(WordleData.user_id, WordleData.wordle_id).in_(wordle_keys)).all()
+        existing_grids = {(user_id, wordle_id): wordle_grid for user_id, wordle_id, wordle_grid in existing_wordles}
+
+        server_wordle_keys = {(s['user_id'], s['server_id'], s['wordle_id']) for s in submissions}
+        existing_server_wordles = {tuple(row) for row in session.query(
+            WordleServerMembership.user_id,
+            WordleServerMembership.server_id,
+            WordleServerMembership.wordle_id
+            ).filter(tuple_(WordleServerMembership.user_id, WordleServerMembership.server_id, WordleServerMembership.wordle_id).in_(server_wordle_keys)).all()}
+
+        results = []
+        new_wordles = []
+        new_server_wordles = []
+        for s in submissions:
+            wordle_key = (s['user_id'], s['wordle_id'])
+            server_wordle_key = (s['user_id'], s['server_id'], s['wordle_id'])
+            existing_grid = existing_grids.get(wordle_key)
+            if (existing_grid is not None and existing_grid != s['wordle_grid']) or server_wordle_key in existing_server_wordles:
+                results.append(False)
+                continue
+
+            if existing_grid is None:
+                existing_grids[wordle_key] = s['wordle_grid']
+                new_wordles.append({
+                    'user_id': s['user_id'],
+                    'wordle_id': s['wordle_id'],
+                    'wordle_score': s['wordle_score'],
+                    'wordle_grid': s['wordle_grid'],
+                    'wordle_date': s['wordle_date']
+                })
+            existing_server_wordles.add(server_wordle_key)
+            new_server_wordles.append({'user_id': s['user_id'], 'server_id': s['server_id'], 'wordle_id': s['wordle_id']})
+            results.append(True)
+
+        stored_wordles = []
+        if new_wordles:
+            inserted = session.execute(insert(WordleData).prefix_with('IGNORE').values(new_wordles)).rowcount
+            if inserted == len(new_wordles):
+                update_user_stats(session, new_wordles)
+                stored_wordles = new_wordles
+            else:
+                # Another writer stored some of these first, so recount the affected users instead of incrementing.
+                # Which rows were ours is unknown, so none are reported as stored.
+                recount_user_stats(session, {w['user_id'] for w in new_wordles})
+        if new_server_wordles:
+            session.execute(insert(WordleServerMembership).prefix_with('IGNORE').values(new_server_wordles))
+
+        # Server leaderboards rank members by all of their Wordles, so every server an accepted user belongs to changes
+        affected_server_ids = set()
+        accepted_user_ids = {s['user_id'] for s, accepted in zip(submissions, results) if accepted}
+        if accepted_user_ids:
+            affected_server_ids = {server_id for server_id, in session.query(ServerMembership.server_id).filter(
+                ServerMembership.user_id.in_(accepted_user_ids)
+                ).distinct().all()}
+
+        session.commit()
+        return results, affected_server_ids, stored_wordles
+
+    except SQLAlchemyError as e:
+        print(f'Database error in submit_wordles: {e}')
+        session.rollback()
+        return None
+
+    finally:
+        session.close()
+
+def update_user_stats(session: Session, new_wordles: list[dict]) -> None:
+    user_ids = {wordle['user_id'] for wordle in new_wordles}
+    existing_stats = session.query(UserStats).filter(UserStats.user_id.in_(user_ids)).with_for_update().all()
+    rows = {
+        stats.user_id: {'user_id': stats.user_id, **{column: getattr(stats, column) for column in USER_STATS_COLUMNS}}
+        for stats in existing_stats
+    }
+
+    recount_user_ids = set()
+    for wordle in sorted(new_wordles, key = lambda w: w['wordle_id']):
+        user_id = wordle['user_id']
+        row = rows.setdefault(user_id, {'user_id': user_id, **{column: 0 for column in COUNT_COLUMNS}, 'current_streak': 0, 'longest_streak': 0, 'last_wordle_number': None})
+        row[SCORE_COLUMNS[wordle['wordle_score']]] += 1
+        row['total_games'] += 1
+        row['score_sum'] += wordle['wordle_score']
+
+        number = wordle['wordle_id']
+        last_number = row['last_wordle_number']
+        if last_number is not None and number <= last_number:
+            # An older Wordle arrived late and may join two runs, which only a full recount can tell
+            recount_user_ids.add(user_id)
+            continue
+        if last_number is not None and number == last_number + 1:
+            row['current_streak'] += 1
         else:
-            existing_membership.display_name = display_name
+            row['current_streak'] = 1
+        row['last_wordle_number'] = number
+        row['longest_streak'] = max(row['longest_streak'], row['current_streak'])
+
+    upsert_rows = [row for user_id, row in rows.items() if user_id not in recount_user_ids]
+    if upsert_rows:
+        stats_stmt = insert(UserStats).values(upsert_rows)
+        session.execute(stats_stmt.on_duplicate_key_update({column: stats_stmt.inserted[column] for column in USER_STATS_COLUMNS}))
+    if recount_user_ids:
+        recount_user_stats(session, recount_user_ids)
+
+def recount_user_streaks(session: Session, user_ids: list[int]) -> None:
+    for start in range(0, len(user_ids), STREAK_RECOUNT_CHUNK_SIZE):
+        chunk = user_ids[start:start + STREAK_RECOUNT_CHUNK_SIZE]
+        results = session.execute(
+            select(WordleData.user_id, WordleData.wordle_id).where(WordleData.user_id.in_(chunk)).order_by(WordleData.user_id, WordleData.wordle_id)
+        ).all()
+
+        numbers_by_user = {}
+        for user_id, number in results:
+            numbers_by_user.setdefault(user_id, []).append(number)
+        if not numbers_by_user:
+            continue
+
+        streak_rows = []
+        for user_id, numbers in numbers_by_user.items():
+            current_streak, longest_streak, last_number = streaks_from_numbers(numbers)
+            streak_rows.append({'user_id': user_id, 'current_streak': current_streak, 'longest_streak': longest_streak, 'last_wordle_number': last_number})
+        streak_stmt = insert(UserStats).values(streak_rows)
+        session.execute(streak_stmt.on_duplicate_key_update({column: streak_stmt.inserted[column] for column in STREAK_COLUMNS}))
+
+def recount_user_stats(session: Session, user_ids: set[int] | None = None) -> int:
+    totals_query = select(
+        WordleData.user_id,
+        *[func.sum(case((WordleData.wordle_score == score, 1), else_ = 0)) for score in SCORE_COLUMNS],
+        func.count(),
+        func.sum(WordleData.wordle_score)
+    ).group_by(WordleData.user_id)
+    delete_stmt = delete(UserStats)
+    if user_ids is not None:
+        totals_query = totals_query.where(WordleData.user_id.in_(user_ids))
+        delete_stmt = delete_stmt.where(UserStats.user_id.in_(user_ids))
+
+    session.execute(delete_stmt)
+    recounted = session.execute(insert(UserStats).from_select(['user_id', *COUNT_COLUMNS], totals_query)).rowcount
+
+    if user_ids is None:
+        user_ids = [user_id for user_id, in session.execute(select(UserStats.user_id)).all()]
+    recount_user_streaks(session, sorted(user_ids))
+    return recounted
+
+def rebuild_user_stats() -> int | None:
+    session = get_session()
+    try:
+        # A full rebuild reads all of wordle_data, so it must not hold read locks submissions would queue behind
+        use_read_committed(session)
+        rebuilt = recount_user_stats(session)
         session.commit()
+        return rebuilt
 
     except SQLAlchemyError as e:
-        print(f'Database error in add_server_membership: {e}')
+        print(f'Database error in rebuild_user_stats: {e}')
         session.rollback()
-    
+        return None
+
     finally:
         session.close()
 
-def add_wordle(user_id: int, wordle_id: str, wordle_score: str, wordle_grid: str, wordle_date) -> None:
+def get_backfill_checkpoint(server_id: int, channel_id: int) -> tuple[int, int, int] | None:
     session = get_session()
     try:
-        existing_wordle = session.query(WordleData).filter(WordleData.user_id == user_id, WordleData.wordle_id == wordle_id).first()
-        
-        if not existing_wordle:
-            new_wordle = WordleData(
-                user_id = user_id,
-                wordle_id = wordle_id,
-                wordle_score = wordle_score,
-                wordle_grid = wordle_grid,
-                wordle_date = wordle_date
-            )
-            session.add(new_wordle)
-            session.commit()
+        checkpoint = session.query(
+            BackfillCheckpoint.last_message_id,
+            BackfillCheckpoint.messages_scanned,
+            BackfillCheckpoint.wordles_accepted
+            ).filter(BackfillCheckpoint.server_id == server_id, BackfillCheckpoint.channel_id == channel_id).first()
+        return tuple(checkpoint) if checkpoint else None
+
+    except SQLAlchemyError as e:
+        print(f'Database error in get_backfill_checkpoint: {e}')
+        return None
+
+    finally:
+        session.close()
+
+def save_backfill_checkpoint(server_id: int, channel_id: int, last_message_id: int, scanned: int, accepted: int) -> bool:
+    # scanned and accepted are counts since the last save, added to the stored totals
+    session = get_session()
+    try:
+        checkpoint_stmt = insert(BackfillCheckpoint).values(
+            server_id = server_id,
+            channel_id = channel_id,
+            last_message_id = last_message_id,
+            messages_scanned = scanned,
+            wordles_accepted = accepted,
+            updated_at = datetime.now(timezone.utc).replace(tzinfo = None)
+        )
+        session.execute(checkpoint_stmt.on_duplicate_key_update(
+            last_message_id = checkpoint_stmt.inserted.last_message_id,
+            messages_scanned = BackfillCheckpoint.messages_scanned + checkpoint_stmt.inserted.messages_scanned,
+            wordles_accepted = BackfillCheckpoint.wordles_accepted + checkpoint_stmt.inserted.wordles_accepted,
+            updated_at = checkpoint_stmt.inserted.updated_at
+        ))
+        session.commit()
+        return True
 
     except SQLAlchemyError as e:
-        print(f"Database error in add_wordle: {e}")
+        print(f'Database error in save_backfill_checkpoint: {e}')
         session.rollback()
+        return False
 
     finally:
         session.close()
 
-def add_wordle_server_membership(user_id: int, server_id: int, wordle_id: int) -> None:
+def member_rows(members: list[discord.Member]) -> list[dict]:
+    # Read on the event loop so the database thread never touches discord.py objects
+    return [{
+        'user_id': member.id,
+        'user_name': member.name,
+        'avatar': member.display_avatar.replace(format = 'png').url,
+        'display_name': member.display_name
+    } for member in members]
+
+def upsert_member(server_id: int, member: dict) -> bool:
+    # One member_rows() row: the user's name and avatar and their display name in this server, in one transaction
     session = get_session()
     try:
-        existing_membership = session.query(WordleServerMembership).filter(
-            WordleServerMembership.user_id == user_id,
-            WordleServerMembership.server_id == server_id,
-            WordleServerMembership.wordle_id == wordle_id
-            ).first()
-        if not existing_membership:
-            new_membership = WordleServerMembership(user_id = user_id, server_id = server_id, wordle_id = wordle_id)
-            session.add(new_membership)
-            session.commit()
+        user_stmt = insert(User).values(user_id = member['user_id'], user_name = member['user_name'], avatar = member['avatar'])
+        session.execute(user_stmt.on_duplicate_key_update(user_name = user_stmt.inserted.user_name, avatar = user_stmt.inserted.avatar))
+        membership_stmt = insert(ServerMembership).values(user_id = member['user_id'], server_id = server_id, display_name = member['display_name'])
+        session.execute(membership_stmt.on_duplicate_key_update(display_name = membership_stmt.inserted.display_name))
+        session.commit()
+        return True
+
+    except SQLAlchemyError as e:
+        print(f'Database error in upsert_member: {e}')
+        session.rollback()
+        return False
+
+    finally:
+        session.close()
+
+def sync_server_members(server_id: int, members: list[dict], progress: Callable[[int, int], None] | None = None) -> tuple[int, int, int] | None:
+    # Diffs the stored memberships against the guild's members and applies the difference in chunked multi-row
+    # statements inside one transaction. Returns (added, renamed, removed) counts.
+    session = get_session()
+    try:
+        stored_names = dict(session.query(ServerMembership.user_id, ServerMembership.display_name).filter(
+            ServerMembership.server_id == server_id
+            ).all())
+        members_by_id = {member['user_id']: member for member in members}
+
+        removed_user_ids = [user_id for user_id in stored_names if user_id not in members_by_id]
+        added = [member for user_id, member in members_by_id.items() if user_id not in stored_names]
+        renamed = [member for user_id, member in members_by_id.items() if user_id in stored_names and stored_names[user_id] != member['display_name']]
+        changed_memberships = added + renamed
+
+        # Every member's user row is upserted so names and avatars stay current; unchanged rows cost MySQL no write
+        total = len(members_by_id) + len(changed_memberships) + len(removed_user_ids)
+        done = 0
+        user_rows = list(members_by_id.values())
+        for start in range(0, len(user_rows), MEMBER_SYNC_CHUNK_SIZE):
+            chunk = user_rows[start:start + MEMBER_SYNC_CHUNK_SIZE]
+            user_stmt = insert(User).values([
+                {'user_id': m['user_id'], 'user_name': m['user_name'], 'avatar': m['avatar']} for m in chunk
+            ])
+            session.execute(user_stmt.on_duplicate_key_update(user_name = user_stmt.inserted.user_name, avatar = user_stmt.inserted.avatar))
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+
+        for start in range(0, len(changed_memberships), MEMBER_SYNC_CHUNK_SIZE):
+            chunk = changed_memberships[start:start + MEMBER_SYNC_CHUNK_SIZE]
+            membership_stmt = insert(ServerMembership).values([
+                {'user_id': m['user_id'], 'server_id': server_id, 'display_name': m['display_name']} for m in chunk
+            ])
+            session.execute(membership_stmt.on_duplicate_key_update(display_name = membership_stmt.inserted.display_name))
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+
+        for start in range(0, len(removed_user_ids), MEMBER_SYNC_CHUNK_SIZE):
+            chunk = removed_user_ids[start:start + MEMBER_SYNC_CHUNK_SIZE]
+            session.execute(delete(ServerMembership).where(
+                ServerMembership.server_id == server_id,
+                ServerMembership.user_id.in_(chunk)
+            ))
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+
+        session.commit()
+        return len(added), len(renamed), len(removed_user_ids)
 
     except SQLAlchemyError as e:
-        print(f'Database error in add_wordle_server_membership: {e}')
+        print(f'Database error in sync_server_members: {e}')
         session.rollback()
-    
+        return None
+
     finally:
         session.close()
 